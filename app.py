@@ -1,8 +1,18 @@
-from flask import Flask, render_template, request, jsonify
-import cloudinary
-import cloudinary.api
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
 import os
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from zip_stream import stream_zip, fetch_from_cloudinary, make_local_fetcher
+from metrics import init_metrics, timed_stage, timed_upstream
+from manifest import load_manifest
+from timeline import load_timeline
+from listing import MAX_IDS_PER_CALL, iter_listing
+
+# Heavy modules (cloudinary, numpy) are imported by the first route that needs
+# them, so serverless cold starts only pay for Flask
 
 # Load environment variables
 load_dotenv()
@@ -10,15 +20,229 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 
-# Configure Cloudinary
-cloudinary.config(
-    cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
-    api_key=os.getenv('CLOUDINARY_API_KEY'),
-    api_secret=os.getenv('CLOUDINARY_API_SECRET')
-)
+# Prometheus /metrics endpoint and per-route latency
+init_metrics(app)
 
 UPLOAD_FOLDER = 'wedding_photos'
 
+# Serve photo downloads from a local folder instead of Cloudinary (offline/testing)
+PHOTO_SOURCE_DIR = os.getenv('PHOTO_SOURCE_DIR')
+
+# 'partitioned' lists prefixes of the gallery folder in parallel when the
+# timeline knows enough public_ids to split on; 'sequential' walks one cursor
+LISTING_MODE = os.getenv('LISTING_MODE', 'partitioned')
+LISTING_CONCURRENCY = int(os.getenv('LISTING_CONCURRENCY', '8'))
+# The Search API count that checks a partitioned listing is reused for this many
+# seconds, so page loads don't each cost a Search call
+LISTING_COUNT_TTL = int(os.getenv('LISTING_COUNT_TTL', '60'))
+
+# A deployed manifest never changes, so photos uploaded after it was built are
+# looked up live: one background Search API call per this many seconds, shared
+# by every request. New photos show up a request or two after this delay; 0
+# serves the manifest as built.
+MANIFEST_REFRESH_SECONDS = int(os.getenv('MANIFEST_REFRESH_SECONDS', '60'))
+MANIFEST_OVERLAP = timedelta(minutes=1)  # Search from a little before builtAt for clock skew
+
+_cloudinary = None
+_count = None  # (checked at, total)
+_recent = None  # (manifest, checked at, photos, body)
+_refreshing = False  # A background recent-uploads check is running
+_recent_lock = threading.Lock()
+
+
+def get_cloudinary():
+    """Import and configure the Cloudinary SDK on first use"""
+    global _cloudinary
+    if _cloudinary is None:
+        import cloudinary
+        import cloudinary.api
+
+        # Only override what is set, so a CLOUDINARY_URL or earlier config still applies
+        settings = {
+            'cloud_name': os.getenv('CLOUDINARY_CLOUD_NAME'),
+            'api_key': os.getenv('CLOUDINARY_API_KEY'),
+            'api_secret': os.getenv('CLOUDINARY_API_SECRET')
+        }
+        cloudinary.config(**{key: value for key, value in settings.items() if value})
+        _cloudinary = cloudinary
+    return _cloudinary
+
+
+def fetch_resources_page(prefix, next_cursor=None):
+    """One Admin API listing page (Cloudinary limits to 500 per request)"""
+    cloudinary = get_cloudinary()
+    options = {'type': 'upload', 'prefix': prefix, 'max_results': 500}
+    if next_cursor:
+        options['next_cursor'] = next_cursor
+    with timed_upstream('cloudinary.resources'):
+        return cloudinary.api.resources(**options)
+
+
+def fetch_resources_by_ids(public_ids):
+    cloudinary = get_cloudinary()
+    with timed_upstream('cloudinary.resources_by_ids'):
+        return cloudinary.api.resources_by_ids(public_ids, max_results=len(public_ids))['resources']
+
+
+def count_resources():
+    """Photos in the gallery folder, from the Search API (reused for LISTING_COUNT_TTL seconds)"""
+    global _count
+    cached = _count
+    if cached is not None and time.monotonic() - cached[0] < LISTING_COUNT_TTL:
+        return cached[1]
+
+    cloudinary = get_cloudinary()
+    with timed_upstream('cloudinary.search'):
+        result = cloudinary.Search().expression(
+            f'public_id:{UPLOAD_FOLDER}/* AND resource_type:image AND type:upload'
+        ).max_results(1).execute()
+    _count = (time.monotonic(), result['total_count'])
+    return result['total_count']
+
+
+def search_all(expression):
+    """Every photo resource matching a Search API expression, following its cursor"""
+    cloudinary = get_cloudinary()
+    search = cloudinary.Search().expression(
+        f'public_id:{UPLOAD_FOLDER}/* AND resource_type:image AND type:upload AND {expression}'
+    ).sort_by('public_id', 'asc').max_results(500)
+
+    resources = []
+    while True:
+        with timed_upstream('cloudinary.search'):
+            result = search.execute()
+        resources.extend(result['resources'])
+        if not result.get('next_cursor'):
+            return resources
+        search = search.next_cursor(result['next_cursor'])
+
+
+def search_uploaded_since(since):
+    """Photo resources uploaded after ``since`` (an aware datetime)"""
+    stamp = since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return search_all(f'uploaded_at>"{stamp}"')
+
+
+def search_outside(prefixes, exact):
+    """Photo resources outside the listing partitions: name prefixes and exact names under the folder"""
+    folder = f'{UPLOAD_FOLDER}/'
+    excluded = [f'public_id:{folder}{prefix}*' for prefix in prefixes]
+    excluded += [f'public_id="{folder}{name}"' for name in exact]
+    return search_all(f'NOT ({" OR ".join(excluded)})')
+
+
+def gallery_photos(manifest):
+    """The manifest's photos plus any uploaded since it was built, with the /api/photos body.
+
+    Never waits on Cloudinary: a cold instance serves the manifest as bundled,
+    and a request that finds the answer due for a check starts it in the
+    background and is served the current answer meanwhile.
+    """
+    global _recent, _refreshing
+    if not MANIFEST_REFRESH_SECONDS or not manifest.built_at:
+        return manifest.photos, manifest.body
+
+    cached = _recent
+    if cached is None or cached[0] is not manifest:
+        # First request on this instance: no Search call (or Cloudinary import) on
+        # the way to its response, but the next request starts the check
+        cached = (manifest, time.monotonic() - MANIFEST_REFRESH_SECONDS, manifest.photos, manifest.body)
+        with _recent_lock:
+            if _recent is None or _recent[0] is not manifest:
+                _recent = cached
+            return _recent[2], _recent[3]
+
+    if time.monotonic() - cached[1] >= MANIFEST_REFRESH_SECONDS:
+        with _recent_lock:
+            start = not _refreshing
+            _refreshing = True
+        if start:
+            threading.Thread(target=_refresh_recent, args=(manifest,), daemon=True).start()
+    return cached[2], cached[3]
+
+
+def _refresh_recent(manifest):
+    """Merge photos uploaded since the manifest was built into the cached answer"""
+    global _recent, _refreshing
+    try:
+        now = time.monotonic()
+        photos, body = manifest.photos, manifest.body
+        try:
+            since = datetime.fromisoformat(manifest.built_at) - MANIFEST_OVERLAP
+            recent = [r for r in search_uploaded_since(since) if r['public_id'] not in manifest.by_id]
+        except Exception as e:
+            # Keep serving the last good answer; the next check is a full interval away
+            print(f"Recent uploads check failed: {str(e)}")
+            if _recent is not None and _recent[0] is manifest:
+                photos, body = _recent[2], _recent[3]
+            recent = []
+
+        if recent:
+            timeline = load_timeline()
+            photos = list(photos)
+            for resource in recent:
+                photo = photo_entry(resource['public_id'])
+                position = timeline.positions.get(photo['publicId']) if timeline else None
+                if position is not None:
+                    photo['takenAt'] = timeline.entries[position]['takenAt']
+                photos.append(photo)
+            if timeline is not None:
+                photos.sort(key=lambda photo: timeline.sort_key(photo['publicId']))
+            body = json.dumps({'success': True, 'photos': photos, 'total': len(photos)}).encode()
+
+        with _recent_lock:
+            _recent = (manifest, now, photos, body)
+    finally:
+        with _recent_lock:
+            _refreshing = False
+
+
+def listing_known_names():
+    """Names (public_ids without the folder) the listing partitions are planned from; none when sequential"""
+    timeline = load_timeline() if LISTING_MODE == 'partitioned' else None
+    if timeline is None:
+        return ()
+    prefix = f'{UPLOAD_FOLDER}/'
+    return [e['publicId'][len(prefix):] for e in timeline.entries if e['publicId'].startswith(prefix)]
+
+
+def iter_resources():
+    """Photo resources in batches as the listing partitions arrive"""
+    return iter_listing(f'{UPLOAD_FOLDER}/', fetch_resources_page, listing_known_names(),
+                        fetch_ids=fetch_resources_by_ids, count_total=count_resources,
+                        fetch_outside=search_outside,
+                        concurrency=LISTING_CONCURRENCY)
+
+
+def list_resources():
+    """Fetch every photo resource"""
+    return [resource for batch in iter_resources() for resource in batch]
+
+
+def sort_by_capture_time(resources):
+    """Sort listed resources into capture order when the timeline index is available"""
+    timeline = load_timeline()
+    if timeline is not None:
+        resources.sort(key=lambda resource: timeline.sort_key(resource['public_id']))
+    return resources
+
+
+def photo_entry(public_id):
+    """Gallery JSON for one photo: thumbnail, screen-sized preview and full-size URLs"""
+    cloudinary = get_cloudinary()
+    return {
+        'publicId': public_id,
+        'url': cloudinary.CloudinaryImage(public_id).build_url(
+            width=400, height=400, crop='fill', quality='auto', fetch_format='auto'
+        ),
+        'previewUrl': cloudinary.CloudinaryImage(public_id).build_url(
+            width=1600, height=1600, crop='limit', quality='auto', fetch_format='auto'
+        ),
+        'fullUrl': cloudinary.CloudinaryImage(public_id).build_url(
+            quality='auto', fetch_format='auto'
+        )
+    }
+
 
 @app.route('/')
 def index():
@@ -27,47 +251,215 @@ def index():
 
 @app.route('/api/photos')
 def get_photos():
+    # ?start=18:00&end=19:00 (optionally &day=YYYY-MM-DD) returns one slice of the timeline
+    if request.args.get('start') or request.args.get('end'):
+        return get_photos_in_range()
+
+    # ?collapse=1 shows one photo per burst
+    collapse = request.args.get('collapse') in ('1', 'true')
+
+    # Serve the prebuilt manifest (plus photos uploaded since) when one was bundled at deploy time
+    manifest = load_manifest()
+    if manifest is not None and not collapse:
+        return Response(gallery_photos(manifest)[1], mimetype='application/json')
+
     try:
-        photos = []
-        next_cursor = None
-        
-        # Fetch all photos using pagination (Cloudinary limits to 500 per request)
-        while True:
-            if next_cursor:
-                result = cloudinary.api.resources(
-                    type='upload',
-                    prefix=f'{UPLOAD_FOLDER}/',
-                    max_results=500,
-                    next_cursor=next_cursor
-                )
-            else:
-                result = cloudinary.api.resources(
-                    type='upload',
-                    prefix=f'{UPLOAD_FOLDER}/',
-                    max_results=500
-                )
-
-            for photo in result['resources']:
-                photos.append({
-                    'publicId': photo['public_id'],
-                    'url': cloudinary.CloudinaryImage(photo['public_id']).build_url(
-                        width=400, height=400, crop='fill', quality='auto', fetch_format='auto'
-                    ),
-                    'fullUrl': cloudinary.CloudinaryImage(photo['public_id']).build_url(
-                        quality='auto', fetch_format='auto'
-                    )
-                })
-            
-            # Check if there are more results
-            next_cursor = result.get('next_cursor')
-            if not next_cursor:
-                break
-
-        return jsonify({'success': True, 'photos': photos, 'total': len(photos)})
+        if manifest is not None:
+            photos = gallery_photos(manifest)[0]
+        else:
+            photos = []
+
+            with timed_stage('listing'):
+                resources = list_resources()
+
+            sort_by_capture_time(resources)
+
+            with timed_stage('build_urls'):
+                for photo in resources:
+                    photos.append(photo_entry(photo['public_id']))
+
+        if collapse:
+            with timed_stage('collapse'):
+                photos = collapse_bursts(photos)
+
+        with timed_stage('jsonify'):
+            return jsonify({'success': True, 'photos': photos, 'total': len(photos)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/photos/stream')
+def stream_photos():
+    """The gallery as NDJSON, one photo per line, so the first photos render early.
+
+    Photos arrive in public_id order; with a timeline each carries its capture
+    position as 'order' for the client to sort by. The last line is
+    {"done": true, "total": n}, or {"error": ...} if the listing failed.
+    """
+    manifest = load_manifest()
+    timeline = load_timeline()
+
+    def generate():
+        total = 0
+        try:
+            batches = [gallery_photos(manifest)[0]] if manifest is not None else iter_resources()
+            for batch in batches:
+                lines = []
+                for photo in batch:
+                    if manifest is None:
+                        photo = photo_entry(photo['public_id'])
+                        if timeline is not None:
+                            photo['order'] = timeline.sort_key(photo['publicId'])
+                    lines.append(json.dumps(photo))
+                total += len(lines)
+                if lines:
+                    yield '\n'.join(lines) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+            return
+        yield json.dumps({'done': True, 'total': total}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+def collapse_bursts(photos):
+    """Keep the first frame of each burst, with the burst's size and members"""
+    timeline = load_timeline()
+    if timeline is None:
+        return photos
+
+    bursts = {group[0]: group for group in timeline.bursts() if len(group) > 1}
+    hidden = {public_id for group in bursts.values() for public_id in group[1:]}
+
+    collapsed = []
+    for photo in photos:
+        if photo['publicId'] in hidden:
+            continue
+        group = bursts.get(photo['publicId'])
+        if group:
+            photo = dict(photo, burstSize=len(group), burstIds=group)
+        collapsed.append(photo)
+    return collapsed
+
+
+def get_photos_in_range():
+    timeline = load_timeline()
+    if timeline is None:
+        return jsonify({'success': False, 'error': 'No timeline index available'}), 404
+
+    try:
+        day = request.args.get('day')
+        start = timeline.resolve(request.args['start'], day) if request.args.get('start') else None
+        end = timeline.resolve(request.args['end'], day) if request.args.get('end') else None
+        # A range like 22:00-01:00 runs past midnight
+        if start and end and end <= start:
+            end += timedelta(days=1)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid time: {str(e)}'}), 400
+
+    manifest = load_manifest()
+    known = manifest.by_id if manifest else {}
+
+    photos = []
+    for entry in timeline.range(start, end):
+        photo = dict(known.get(entry['publicId']) or photo_entry(entry['publicId']))
+        photo['takenAt'] = entry['takenAt']
+        photo['camera'] = entry['camera']
+        photos.append(photo)
+
+    return jsonify({
+        'success': True,
+        'photos': photos,
+        'total': len(photos),
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None
+    })
+
+
+@app.route('/api/photos/listed')
+def listed_photos():
+    """Which of the given public ids (?id=...&id=..., at most 100) /api/photos lists right now.
+
+    A cheap check for watch_folder.py: with a manifest it reads the cached
+    answer, otherwise it makes one resources_by_ids call instead of a full listing.
+    """
+    public_ids = request.args.getlist('id')[:MAX_IDS_PER_CALL]
+    manifest = load_manifest()
+
+    try:
+        if manifest is not None:
+            listed = {photo['publicId'] for photo in gallery_photos(manifest)[0]}
+            found = [public_id for public_id in public_ids if public_id in listed]
+        elif public_ids:
+            found = [resource['public_id'] for resource in fetch_resources_by_ids(public_ids)]
+        else:
+            found = []
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, 'publicIds': found})
+
+
+@app.route('/api/timeline')
+def get_timeline():
+    """Photo counts per time bucket and per camera"""
+    timeline = load_timeline()
+    if timeline is None:
+        return jsonify({'success': False, 'error': 'No timeline index available'}), 404
+
+    minutes = request.args.get('bucket', 30, type=int)
+    cameras = {}
+    for entry in timeline.entries:
+        cameras[entry['camera']] = cameras.get(entry['camera'], 0) + 1
+
+    return jsonify({
+        'success': True,
+        'total': len(timeline),
+        'buckets': timeline.buckets(max(1, minutes)),
+        'cameras': cameras
+    })
+
+
+@app.route('/api/download', methods=['POST'])
+def download_photos():
+    """Stream a ZIP of the requested photos (JSON or form body)"""
+    data = request.get_json(silent=True) or request.form
+
+    if data.get('all') in (True, 'true', '1'):
+        manifest = load_manifest()
+        try:
+            if manifest is not None:
+                public_ids = [photo['publicId'] for photo in gallery_photos(manifest)[0]]
+            else:
+                public_ids = [photo['public_id'] for photo in list_resources()]
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+    elif request.is_json:
+        public_ids = data.get('publicIds') or []
+    else:
+        public_ids = data.getlist('publicIds')
+
+    # Only photos from the gallery folder can be downloaded
+    public_ids = list(dict.fromkeys(
+        p for p in public_ids if isinstance(p, str) and p.startswith(f'{UPLOAD_FOLDER}/')
+    ))
+    if not public_ids:
+        return jsonify({'success': False, 'error': 'No photos selected'}), 400
+
+    if PHOTO_SOURCE_DIR:
+        fetch = make_local_fetcher(PHOTO_SOURCE_DIR)
+    else:
+        get_cloudinary()
+        fetch = fetch_from_cloudinary
+
+    return Response(
+        stream_with_context(stream_zip(public_ids, fetch)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename="wedding-photos.zip"'}
+    )
+
+
 if __name__ == '__main__':
     print("Starting Wedding Photo Gallery Server...")
     print("Open http://localhost:5000 in your browser")
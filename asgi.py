@@ -0,0 +1,254 @@
+"""ASGI entry point for the gallery.
+
+The photo listing and static files are served by async handlers, so a slow
+Cloudinary pagination no longer blocks other guests. Every other route is
+handed to the Flask app, each request on its own thread from a pool of
+FLASK_THREADS, so a long ZIP download or listing stream doesn't hold up the
+rest of the site.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import (app as flask_app, UPLOAD_FOLDER, LISTING_CONCURRENCY, get_cloudinary, count_resources,
+                 search_outside, listing_known_names, gallery_photos, photo_entry, sort_by_capture_time)
+from listing import MAX_IDS_PER_CALL, plan_partitions
+from manifest import load_manifest
+from metrics import REQUEST_LATENCY, REQUESTS, timed_stage, timed_upstream
+
+HTTP_POOL_SIZE = 20  # Shared keep-alive connections to the Cloudinary API
+UPSTREAM_TIMEOUT = 30  # seconds
+STATIC_DIR = Path(__file__).parent / 'static'
+STATIC_MAX_AGE = 3600  # seconds
+
+FLASK_THREADS = int(os.getenv('FLASK_THREADS', '16'))  # Flask requests handled at once
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    """Runs the WSGI app on a thread pool.
+
+    asgiref's default is thread_sensitive=True, which puts every request on
+    one shared thread, one after another.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=FLASK_THREADS, thread_name_prefix='flask')
+
+    def run_wsgi_app(self, body):
+        run = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func  # The undecorated method
+        return sync_to_async(run, thread_sensitive=False, executor=self.executor)(self, body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+flask_asgi = PooledWsgiToAsgi(flask_app)
+http_client = None  # Created on startup, shared by all requests
+static_cache = {}  # path -> (mtime, body, etag)
+
+
+def get_http_client():
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=UPSTREAM_TIMEOUT,
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE,
+                                max_keepalive_connections=HTTP_POOL_SIZE)
+        )
+    return http_client
+
+
+async def list_resources_async():
+    """Async version of app.list_resources: the same partitions, walked side by side over the shared pool"""
+    cloudinary = get_cloudinary()
+    config = cloudinary.config()
+    prefix = config.upload_prefix or 'https://api.cloudinary.com'
+    url = f'{prefix}/{cloudinary.API_VERSION}/{config.cloud_name}/resources/image/upload'
+    client = get_http_client()
+    folder = f'{UPLOAD_FOLDER}/'
+    in_flight = asyncio.Semaphore(LISTING_CONCURRENCY)
+
+    async def call(params):
+        async with in_flight:
+            with timed_upstream('cloudinary.resources'):
+                response = await client.get(url, params=params, auth=(config.api_key, config.api_secret))
+                result = response.json()
+        if 'error' in result:
+            raise Exception(f"Error {response.status_code} - {result['error']['message']}")
+        return result
+
+    async def walk(partition):
+        resources = []
+        params = {'prefix': folder + partition, 'max_results': 500}
+        while True:
+            result = await call(params)
+            resources.extend(result['resources'])
+
+            # Check if there are more results
+            next_cursor = result.get('next_cursor')
+            if not next_cursor:
+                return resources
+            params['next_cursor'] = next_cursor
+
+    async def by_ids(names):
+        params = [('public_ids[]', folder + name) for name in names] + [('max_results', len(names))]
+        return (await call(params))['resources']
+
+    async def count():
+        try:
+            return await asyncio.to_thread(count_resources)
+        except Exception:
+            return None
+
+    prefixes, exact = plan_partitions(listing_known_names())
+    if prefixes == ['']:
+        return await walk('')
+
+    total, *batches = await asyncio.gather(
+        count(),
+        *[walk(partition) for partition in prefixes],
+        *[by_ids(exact[i:i + MAX_IDS_PER_CALL]) for i in range(0, len(exact), MAX_IDS_PER_CALL)]
+    )
+    resources = [resource for batch in batches for resource in batch]
+    seen = {resource['public_id'] for resource in resources}
+    if total is not None and total <= len(seen):
+        return resources
+
+    # Photos the timeline doesn't know about yet, as listing.iter_listing finds them
+    try:
+        outside = await asyncio.to_thread(search_outside, prefixes, exact)
+    except Exception:
+        outside = await walk('')
+    resources.extend(resource for resource in outside if resource['public_id'] not in seen)
+    return resources
+
+
+def build_photos_payload(resources):
+    sort_by_capture_time(resources)
+    with timed_stage('build_urls', route='/api/photos'):
+        photos = [photo_entry(photo['public_id']) for photo in resources]
+    with timed_stage('jsonify', route='/api/photos'):
+        return json.dumps({'success': True, 'photos': photos, 'total': len(photos)}).encode()
+
+
+async def send_response(send, status, body, content_type, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode()),
+            (b'content-length', str(len(body)).encode()),
+            *headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def photos_endpoint(scope, receive, send):
+    # Serve the prebuilt manifest (plus photos uploaded since) when one was bundled at deploy time
+    manifest = load_manifest()
+    if manifest is not None:
+        # Never blocks: the recent-uploads check runs in the background
+        _, body = gallery_photos(manifest)
+        await send_response(send, 200, body, 'application/json')
+        return 200
+
+    try:
+        with timed_stage('listing', route='/api/photos'):
+            resources = await list_resources_async()
+
+        # URL building and JSON encoding are CPU work - keep them off the event loop
+        body = await asyncio.to_thread(build_photos_payload, resources)
+        await send_response(send, 200, body, 'application/json')
+        return 200
+    except Exception as e:
+        body = json.dumps({'success': False, 'error': str(e)}).encode()
+        await send_response(send, 500, body, 'application/json')
+        return 500
+
+
+async def static_endpoint(scope, receive, send):
+    """Serve files from static/ out of memory, with ETag revalidation"""
+    relative = scope['path'][len('/static/'):]
+    path = (STATIC_DIR / relative).resolve()
+
+    if STATIC_DIR.resolve() not in path.parents or not path.is_file():
+        await send_response(send, 404, b'Not Found', 'text/plain')
+        return 404
+
+    mtime = path.stat().st_mtime
+    cached = static_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        body = await asyncio.to_thread(path.read_bytes)
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        cached = static_cache[path] = (mtime, body, etag)
+    _, body, etag = cached
+
+    headers = dict(scope.get('headers', []))
+    cache_headers = [
+        (b'etag', etag.encode()),
+        (b'cache-control', f'public, max-age={STATIC_MAX_AGE}'.encode())
+    ]
+    if headers.get(b'if-none-match') == etag.encode():
+        await send({'type': 'http.response.start', 'status': 304, 'headers': cache_headers})
+        await send({'type': 'http.response.body', 'body': b''})
+        return 304
+
+    content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+    await send_response(send, 200, body, content_type, cache_headers)
+    return 200
+
+
+ASYNC_ROUTES = {
+    ('GET', '/api/photos'): ('/api/photos', photos_endpoint),
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            get_http_client()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if http_client is not None:
+                await http_client.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http':
+        method, path = scope['method'], scope['path']
+        if (method, path) in ASYNC_ROUTES and not scope.get('query_string'):
+            route, handler = ASYNC_ROUTES[(method, path)]
+        elif method == 'GET' and path.startswith('/static/'):
+            route, handler = '/static/<path:filename>', static_endpoint
+        else:
+            route, handler = None, None
+
+        if handler is not None:
+            start = time.perf_counter()
+            status = await handler(scope, receive, send)
+            REQUEST_LATENCY.observe((route, method), time.perf_counter() - start)
+            REQUESTS.inc((route, method, str(status)))
+            return
+
+    # Everything else (index page, downloads, range queries, /metrics) goes through Flask
+    await flask_asgi(scope, receive, send)
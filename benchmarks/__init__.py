@@ -0,0 +1,6 @@
+"""Offline benchmarks against a local Cloudinary stand-in.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --output bench_results.json
+"""
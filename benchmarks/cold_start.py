@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.fake_cloudinary import FakeCloudinary, CLOUD_NAME
+from benchmarks.synthetic import make_public_ids
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter, like a serverless cold start
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import index
+imported = time.perf_counter()
+response = index.app.test_client().get('/api/photos')
+served = time.perf_counter()
+assert response.status_code == 200, response.data[:200]
+print(json.dumps({
+    'importSeconds': imported - start,
+    'firstRequestSeconds': served - imported,
+    'lazyModules': {name: name in sys.modules for name in ('cloudinary', 'numpy')}
+}))
+'''
+
+
+def run_child(env):
+    output = subprocess.run([sys.executable, '-c', CHILD_SCRIPT], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(env, top=8):
+    """Heaviest modules imported by app.py, from python -X importtime"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import index'], cwd=REPO_ROOT,
+                            env=env, capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # index (depth 0) imports app (depth 1), whose own imports are depth 2
+        if depth == 2:
+            modules.append((name.strip(), int(parts[1]) / 1_000_000))
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return {name: round(seconds, 4) for name, seconds in modules[:top]}
+
+
+def bench_cold_start(photo_count, latency, runs):
+    """Import time and first /api/photos latency in a fresh process, with and without a manifest"""
+    import app
+    from manifest import write_manifest
+
+    results = {}
+    with FakeCloudinary(latency=latency) as fake, tempfile.TemporaryDirectory() as tmp:
+        fake.add_resources(make_public_ids(photo_count))
+        fake.configure_cloudinary()
+
+        manifest_path = os.path.join(tmp, 'manifest.json')
+        write_manifest([app.photo_entry(p) for p in make_public_ids(photo_count)], manifest_path)
+
+        base_env = {k: v for k, v in os.environ.items() if not k.startswith('CLOUDINARY_')}
+        base_env['CLOUDINARY_URL'] = f'cloudinary://bench-key:bench-secret@{CLOUD_NAME}?upload_prefix={fake.url}'
+
+        variants = {
+            'live': dict(base_env, MANIFEST_FILE=os.path.join(tmp, 'missing.json')),
+            'manifest': dict(base_env, MANIFEST_FILE=manifest_path)
+        }
+        for variant, env in variants.items():
+            samples = [run_child(env) for _ in range(runs)]
+            best = min(samples, key=lambda s: s['importSeconds'] + s['firstRequestSeconds'])
+            results[f'coldstart/{variant}'] = {
+                'seconds': round(best['importSeconds'] + best['firstRequestSeconds'], 4),
+                'importSeconds': round(best['importSeconds'], 4),
+                'firstRequestSeconds': round(best['firstRequestSeconds'], 4),
+                'lazyModules': best['lazyModules']
+            }
+            r = results[f'coldstart/{variant}']
+            print(f"  cold start ({variant}): import {r['importSeconds']:.3f}s + "
+                  f"first request {r['firstRequestSeconds']:.3f}s")
+
+        results['coldstart/import_profile'] = {
+            'seconds': results['coldstart/manifest']['importSeconds'],
+            'modules': import_profile(variants['manifest'])
+        }
+    return results
@@ -0,0 +1,299 @@
+import bisect
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import cloudinary
+
+CLOUD_NAME = 'bench'
+PAGE_LIMIT = 500  # Same cap as the real Admin API
+
+
+class FakeCloudinary:
+    """Local stand-in for the parts of the Cloudinary API the app uses.
+
+    Emulates the Admin API ``resources`` listing (with cursors, or by
+    ``public_ids``), ``usage``, Search API counts and the upload endpoint,
+    including chunked uploads (Content-Range + X-Unique-Upload-Id). Latency,
+    bandwidth and failures can be configured to reproduce slow or flaky links.
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None, error_rate=0.0, drop_rate=0.0,
+                 drop_per_mb=0.0, seed=0, storage_limit=25 * 1024 ** 3):
+        self.latency = latency          # Seconds added to every request
+        self.bandwidth = bandwidth      # Bytes per second for bodies, None = unlimited
+        self.error_rate = error_rate    # Fraction of requests answered with a 500
+        self.drop_rate = drop_rate      # Fraction of requests whose connection is dropped
+        self.drop_per_mb = drop_per_mb  # Chance of a drop per MB of request body, like a flaky link
+        self.storage_limit = storage_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.resources = {}             # public_id -> resource dict
+        self.sorted_ids = []            # public_ids in listing order
+        self.requests = {}              # endpoint -> request count
+        self.bytes_received = 0         # Request body bytes, including dropped requests
+        self.partial_uploads = {}       # upload id -> {'total': n, 'data': bytearray}
+        self.server = None
+
+    # -- Setup ---------------------------------------------------------------
+
+    def add_resources(self, public_ids, bytes_each=500_000):
+        with self.lock:
+            for public_id in public_ids:
+                self.resources[public_id] = self._resource(public_id, bytes_each)
+            self.sorted_ids = sorted(self.resources)
+
+    def _resource(self, public_id, size):
+        return {
+            'public_id': public_id,
+            'format': 'jpg',
+            'version': 1,
+            'resource_type': 'image',
+            'type': 'upload',
+            'bytes': size,
+            'width': 2400,
+            'height': 1600,
+            'folder': public_id.rpartition('/')[0],
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        }
+
+    def start(self):
+        handler = _make_handler(self)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def configure_cloudinary(self):
+        """Point the Cloudinary SDK at this server"""
+        cloudinary.config(
+            cloud_name=CLOUD_NAME,
+            api_key='bench-key',
+            api_secret='bench-secret',
+            upload_prefix=self.url
+        )
+
+    def request_count(self, endpoint):
+        with self.lock:
+            return self.requests.get(endpoint, 0)
+
+    # -- Behaviour -----------------------------------------------------------
+
+    def count(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def roll(self, rate):
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+    def roll_body(self, size):
+        """Drop a request with a chance that grows with its body size"""
+        if not self.drop_per_mb or not size:
+            return False
+        return self.roll(1 - (1 - self.drop_per_mb) ** (size / (1024 * 1024)))
+
+    def throttle(self, size):
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    def list_resources(self, query):
+        if 'public_ids[]' in query:
+            with self.lock:
+                return {'resources': [self.resources[p] for p in query['public_ids[]'] if p in self.resources]}
+
+        prefix = query.get('prefix', [''])[0]
+        max_results = min(int(query.get('max_results', ['10'])[0]), PAGE_LIMIT)
+        offset = int(query.get('next_cursor', ['0'])[0])
+
+        with self.lock:
+            start = bisect.bisect_left(self.sorted_ids, prefix)
+            end = bisect.bisect_left(self.sorted_ids, prefix + '\uffff')
+            page_ids = self.sorted_ids[start + offset:min(end, start + offset + max_results)]
+            page = [self.resources[p] for p in page_ids]
+
+        result = {'resources': page}
+        if start + offset + max_results < end:
+            result['next_cursor'] = str(offset + max_results)
+        return result
+
+    def search(self, body):
+        """Search API, enough for 'public_id:<prefix>*' counts, 'uploaded_at>"<time>"' filters
+        and a trailing 'NOT (public_id:<prefix>* OR public_id="<id>" ...)'"""
+        query = json.loads(body or b'{}')
+        expression, _, excluded = query.get('expression', '').partition(' NOT (')
+        excluded_prefixes = tuple(re.findall(r'public_id:(\S+?)\*', excluded))
+        excluded_ids = set(re.findall(r'public_id="([^"]+)"', excluded))
+        match = re.search(r'public_id:(\S+?)\*', expression)
+        prefix = match.group(1) if match else ''
+        since = re.search(r'uploaded_at>"?([^"\s]+)"?', expression)
+        max_results = min(query.get('max_results', 50), PAGE_LIMIT)
+        offset = int(query.get('next_cursor') or 0)
+        with self.lock:
+            start = bisect.bisect_left(self.sorted_ids, prefix)
+            end = bisect.bisect_left(self.sorted_ids, prefix + '\uffff')
+            matches = self.sorted_ids[start:end]
+            if since:
+                # Same-format UTC stamps compare as strings
+                matches = [p for p in matches if self.resources[p]['created_at'] > since.group(1)]
+            if excluded:
+                matches = [p for p in matches if not p.startswith(excluded_prefixes) and p not in excluded_ids]
+            ids = matches[offset:offset + max_results]
+            result = {'total_count': len(matches), 'resources': [self.resources[p] for p in ids]}
+        if offset + max_results < len(matches):
+            result['next_cursor'] = str(offset + max_results)
+        return result
+
+    def usage(self):
+        with self.lock:
+            used = sum(r['bytes'] for r in self.resources.values())
+            count = len(self.resources)
+        return {
+            'plan': 'Bench',
+            'storage': {'usage': used, 'limit': self.storage_limit},
+            'bandwidth': {'usage': 0, 'limit': 25 * 1024 ** 3},
+            'transformations': {'usage': 0, 'limit': 25000},
+            'resources': count
+        }
+
+    def upload(self, body, size=None):
+        fields = dict(re.findall(rb'name="([^"]+)"\r\n\r\n([^\r]*)\r\n', body))
+        folder = fields.get(b'folder', b'').decode()
+        name = fields.get(b'public_id', b'upload').decode()
+        public_id = f'{folder}/{name}' if folder else name
+
+        resource = self._resource(public_id, size or len(body))
+        with self.lock:
+            if public_id not in self.resources:
+                bisect.insort(self.sorted_ids, public_id)
+            self.resources[public_id] = resource
+        return resource
+
+
+    def upload_chunk(self, body, content_type, content_range, upload_id):
+        """Store one chunk; returns (status, payload) - the resource once all bytes arrived"""
+        match = re.match(r'bytes (\d+)-(\d+)/(\d+)', content_range or '')
+        if not match:
+            return 400, {'error': {'message': 'Invalid Content-Range'}}
+        start, end, total = (int(g) for g in match.groups())
+        chunk = _form_file(body, content_type)
+
+        with self.lock:
+            partial = self.partial_uploads.setdefault(upload_id, {'total': total, 'data': bytearray()})
+            received = len(partial['data'])
+            if start > received:
+                return 400, {'error': {'message': f'Missing bytes {received}-{start - 1}'}}
+            # Re-sent chunks (the client never saw our reply) overlap what we have
+            partial['data'][start:end + 1] = chunk
+            done = len(partial['data']) >= total
+            if done:
+                del self.partial_uploads[upload_id]
+
+        if not done:
+            return 200, {'done': False, 'upload_id': upload_id, 'bytes': end + 1}
+        return 200, self.upload(body, size=total)
+
+
+def _form_file(body, content_type):
+    """Contents of the 'file' field of a multipart/form-data body"""
+    boundary = b'--' + content_type.split('boundary=')[-1].strip('"').encode()
+    for part in body.split(boundary):
+        headers, _, content = part.partition(b'\r\n\r\n')
+        if b'name="file"' in headers:
+            return content[:-2]  # Strip the CRLF before the next boundary
+    return b''
+
+
+def _make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # Headers and body are separate writes; avoid delayed-ACK stalls
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            fake.throttle(len(body))
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length) if length else b''
+            fake.throttle(len(body))
+            with fake.lock:
+                fake.bytes_received += len(body)
+            return body
+
+        def _dispatch(self, method):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            body = self._read_body() if method == 'POST' else b''
+
+            if fake.latency:
+                time.sleep(fake.latency)
+
+            if fake.roll(fake.drop_rate) or fake.roll_body(len(body)):
+                # Simulate a dropped connection: no response at all
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            if fake.roll(fake.error_rate):
+                fake.count('error')
+                self._send_json(500, {'error': {'message': 'Injected error'}})
+                return
+
+            # /v1_1/<cloud>/<...>
+            route = '/'.join(parts[2:])
+            if method == 'GET' and route.startswith('resources/image'):
+                fake.count('resources')
+                self._send_json(200, fake.list_resources(parse_qs(url.query)))
+            elif method == 'POST' and route == 'resources/search':
+                fake.count('search')
+                self._send_json(200, fake.search(body))
+            elif method == 'GET' and route == 'usage':
+                fake.count('usage')
+                self._send_json(200, fake.usage())
+            elif method == 'POST' and route == 'image/upload' and self.headers.get('X-Unique-Upload-Id'):
+                fake.count('upload_chunk')
+                self._send_json(*fake.upload_chunk(body, self.headers.get('Content-Type'),
+                                                   self.headers.get('Content-Range'),
+                                                   self.headers.get('X-Unique-Upload-Id')))
+            elif method == 'POST' and route == 'image/upload':
+                fake.count('upload')
+                self._send_json(200, fake.upload(body))
+            else:
+                self._send_json(404, {'error': {'message': f'Unknown endpoint {url.path}'}})
+
+        def do_GET(self):
+            self._dispatch('GET')
+
+        def do_POST(self):
+            self._dispatch('POST')
+
+    return Handler
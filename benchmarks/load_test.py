@@ -0,0 +1,118 @@
+import argparse
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import uvicorn
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from benchmarks.fake_cloudinary import FakeCloudinary
+from benchmarks.synthetic import make_public_ids
+
+
+def serve_sync(port):
+    """The app as deployed before: one synchronous worker handling one request at a time"""
+    import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', port, app.app, threaded=False, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def serve_asgi(port):
+    """The ASGI entry point under uvicorn (single process)"""
+    import asgi
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host='127.0.0.1', port=port,
+                                           log_level='warning', lifespan='on'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+    return stop
+
+
+LOAD_PATHS = ['/api/photos', '/', '/api/photos/stream']  # Async listing, Flask page, Flask NDJSON stream
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        'p50Seconds': round(latencies[len(latencies) // 2], 3),
+        'p95Seconds': round(latencies[math.ceil(len(latencies) * 0.95) - 1], 3)
+    }
+
+
+def run_load(base_url, concurrency, requests_per_client, paths=LOAD_PATHS):
+    """Hit the paths in turn from `concurrency` clients at once; return throughput and latencies"""
+    latencies = {path: [] for path in paths}
+    lock = threading.Lock()
+
+    def client(offset):
+        with httpx.Client(timeout=120) as session:
+            for i in range(requests_per_client):
+                # Each client starts on a different path so every route is in flight at once
+                path = paths[(offset + i) % len(paths)]
+                start = time.perf_counter()
+                response = session.get(base_url + path)
+                response.raise_for_status()
+                with lock:
+                    latencies[path].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(client, n) for n in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    every = [seconds for path in paths for seconds in latencies[path]]
+    return {
+        'seconds': round(elapsed, 3),
+        'requestsPerSecond': round(len(every) / elapsed, 2),
+        **percentiles(every),
+        'paths': {path: percentiles(latencies[path]) for path in paths if latencies[path]}
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent load test of the listing, index page and stream: sync worker vs ASGI')
+    parser.add_argument('--photos', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds per Admin API call')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=6, help='Requests per client, spread over the paths')
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args(argv)
+
+    results = {}
+    with FakeCloudinary(latency=args.latency) as fake:
+        fake.add_resources(make_public_ids(args.photos))
+
+        for mode, serve, port in (('sync', serve_sync, 5101), ('asgi', serve_asgi, 5102)):
+            stop = serve(port)
+            fake.configure_cloudinary()
+            try:
+                for concurrency in args.concurrency:
+                    result = run_load(f'http://127.0.0.1:{port}', concurrency, args.requests)
+                    results[f'load/{mode}/c={concurrency}'] = result
+                    print(f"  {mode:<4} c={concurrency:<3} {result['requestsPerSecond']:>7} req/s  "
+                          f"p50 {result['p50Seconds']}s  p95 {result['p95Seconds']}s")
+                    for path, latency in result['paths'].items():
+                        print(f"       {path:<20} p50 {latency['p50Seconds']}s  p95 {latency['p95Seconds']}s")
+            finally:
+                stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,430 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.cold_start import bench_cold_start
+from benchmarks.fake_cloudinary import FakeCloudinary
+from benchmarks.synthetic import make_public_ids, make_jpeg_bytes, write_image_folder, make_face_records
+
+RESULTS_SCHEMA = 1
+REGRESSION_THRESHOLD = 0.2  # Flag scenarios that got 20% slower
+
+LISTING_SIZES = (1_000, 10_000, 100_000)
+UPLOAD_WORKERS = (1, 2, 4, 8)
+FACE_DB_SIZES = (1_000, 10_000, 50_000)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def best_of(repeat, run):
+    """Run a scenario several times and keep the fastest result"""
+    results = [run() for _ in range(repeat)]
+    return min(results, key=lambda r: r['seconds'])
+
+
+def bench_listing(sizes, latency, repeat):
+    """GET /api/photos against a fake library of each size"""
+    import app
+
+    results = {}
+    for size in sizes:
+        with FakeCloudinary(latency=latency) as fake:
+            fake.add_resources(make_public_ids(size))
+            fake.configure_cloudinary()
+            client = app.app.test_client()
+
+            def run():
+                calls_before = fake.request_count('resources')
+                start = time.perf_counter()
+                response = client.get('/api/photos')
+                seconds = time.perf_counter() - start
+                data = response.get_json()
+                assert data['success'] and data['total'] == size, data.get('error')
+                return {
+                    'seconds': round(seconds, 4),
+                    'photosPerSecond': round(size / seconds, 1),
+                    'upstreamCalls': fake.request_count('resources') - calls_before,
+                    'responseBytes': len(response.data)
+                }
+
+            results[f'listing/{size}'] = best_of(repeat, run)
+            print(f"  listing {size:>7} photos: {results[f'listing/{size}']['seconds']:.3f}s")
+    return results
+
+
+def bench_listing_stream(sizes, latency, repeat):
+    """GET /api/photos/stream, sequential versus partitioned by the timeline's ids"""
+    import app
+    import timeline
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        timeline.TIMELINE_FILE = str(Path(tmp) / 'timeline.jsonl')
+
+        for size in sizes:
+            public_ids = make_public_ids(size)
+            with open(timeline.TIMELINE_FILE, 'w') as f:
+                for i, public_id in enumerate(public_ids):
+                    f.write(json.dumps({'publicId': public_id, 'camera': 'Bench',
+                                        'takenAt': f'2026-06-20T{12 + i // 3600 % 12:02d}:{i // 60 % 60:02d}:{i % 60:02d}'}) + '\n')
+
+            with FakeCloudinary(latency=latency) as fake:
+                fake.add_resources(public_ids)
+                fake.configure_cloudinary()
+                client = app.app.test_client()
+
+                for mode in ('sequential', 'partitioned'):
+                    def run():
+                        app.LISTING_MODE = mode
+                        calls_before = fake.request_count('resources')
+                        start = time.perf_counter()
+                        first_photo = None
+                        lines = []
+                        for chunk in client.get('/api/photos/stream').response:
+                            if first_photo is None:
+                                first_photo = time.perf_counter() - start
+                            lines.extend(chunk.decode().splitlines())
+                        seconds = time.perf_counter() - start
+                        last = json.loads(lines[-1])
+                        assert last.get('total') == size, last
+                        return {
+                            'seconds': round(seconds, 4),
+                            'firstPhotoSeconds': round(first_photo, 4),
+                            'upstreamCalls': fake.request_count('resources') - calls_before
+                        }
+
+                    key = f'listing-stream/{mode}/{size}'
+                    results[key] = best_of(repeat, run)
+                    print(f"  stream {mode:<11} {size:>7} photos: first after {results[key]['firstPhotoSeconds']:.3f}s, "
+                          f"all in {results[key]['seconds']:.3f}s")
+        app.LISTING_MODE = 'partitioned'
+    return results
+
+
+def bench_upload(worker_counts, image_count, latency, bandwidth, error_rate, repeat):
+    """Compress and upload synthetic camera JPEGs through the upload pipeline"""
+    import timeline
+    from upload_pipeline import UploadPipeline
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        images = write_image_folder(Path(tmp) / 'card', image_count)
+        # Keep the run's bookkeeping out of the working directory
+        timeline.TIMELINE_FILE = str(Path(tmp) / 'timeline.jsonl')
+        pipeline = UploadPipeline('bench_upload',
+                                  skip_duplicates=False,  # The synthetic folder repeats frames
+                                  uploaded_files=str(Path(tmp) / 'uploaded_files.txt'),
+                                  sessions_file=str(Path(tmp) / 'upload_sessions.json'))
+        pipeline.retry_delay = 0
+
+        with FakeCloudinary(latency=latency, bandwidth=bandwidth, error_rate=error_rate) as fake:
+            fake.configure_cloudinary()
+
+            for workers in worker_counts:
+                def run():
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()), \
+                            ThreadPoolExecutor(max_workers=workers) as executor:
+                        outcomes = list(executor.map(
+                            lambda item: pipeline.process_single_image(item[1], item[0], image_count),
+                            enumerate(images, 1)))
+                    seconds = time.perf_counter() - start
+                    return {
+                        'seconds': round(seconds, 4),
+                        'imagesPerSecond': round(image_count / seconds, 2),
+                        'failed': sum(1 for o in outcomes if not o['success'])
+                    }
+
+                results[f'upload/workers={workers}'] = best_of(repeat, run)
+                r = results[f'upload/workers={workers}']
+                print(f"  upload {workers} worker(s): {r['seconds']:.2f}s ({r['imagesPerSecond']} img/s)")
+    return results
+
+
+def bench_resumable(file_count, file_size, drop_per_mb, bandwidth, latency):
+    """Single-shot versus chunked uploads over a link whose drops grow with transfer size"""
+    import os
+    from chunked_upload import ResumableUploader
+
+    files = [os.urandom(file_size) for _ in range(file_count)]
+    chunk_size = max(file_size // 8, 64 * 1024)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('single', 'chunked'):
+            with FakeCloudinary(latency=latency, bandwidth=bandwidth, drop_per_mb=drop_per_mb, seed=1) as fake:
+                fake.configure_cloudinary()
+                uploader = ResumableUploader(str(Path(tmp) / f'{mode}_sessions.json'), mode=mode,
+                                             min_chunk_size=chunk_size, max_chunk_size=chunk_size,
+                                             retry_delay=0)
+
+                attempts = 0
+                start = time.perf_counter()
+                for i, data in enumerate(files):
+                    # Whole-file retries, like process_single_image's MAX_RETRIES loop
+                    for attempt in range(20):
+                        attempts += 1
+                        try:
+                            uploader.upload(io.BytesIO(data), folder='bench', public_id=f'file_{i}',
+                                            resource_type='image', timeout=30)
+                            break
+                        except Exception:
+                            continue
+                seconds = time.perf_counter() - start
+
+                results[f'resumable/{mode}'] = {
+                    'seconds': round(seconds, 4),
+                    'bytesSent': fake.bytes_received,
+                    'overhead': round(fake.bytes_received / (file_count * file_size), 2),
+                    'attempts': attempts
+                }
+                r = results[f'resumable/{mode}']
+                print(f"  {mode:<8} {r['seconds']:.2f}s, sent {r['overhead']}x the file bytes")
+    return results
+
+
+def bench_encode(image_count, formats, repeat):
+    """Resize + encode time against output size for each encoding profile"""
+    from PIL import Image
+    from encoding import PROFILES, resize, encode_image
+    from upload_pipeline import TARGET_SIZE
+
+    # Decode the samples once, the way compress_image does, so only the profile's work is timed
+    samples = []
+    for seed in range(image_count):
+        img = Image.open(io.BytesIO(make_jpeg_bytes(seed=seed)))
+        img.draft(None, (TARGET_SIZE[0] * 2, TARGET_SIZE[1] * 2))
+        img.load()
+        samples.append(img)
+
+    results = {}
+    for fmt in formats:
+        for name, profile in PROFILES.items():
+            def run():
+                seconds = 0
+                total_bytes = 0
+                for sample in samples:
+                    img = sample.copy()
+                    start = time.perf_counter()
+                    buffer = encode_image(resize(img, TARGET_SIZE, profile), profile, fmt)
+                    seconds += time.perf_counter() - start
+                    total_bytes += buffer.getbuffer().nbytes
+                return {
+                    'seconds': round(seconds / len(samples), 4),
+                    'bytesPerImage': total_bytes // len(samples)
+                }
+
+            key = f'encode/{name}/{fmt}'
+            results[key] = best_of(repeat, run)
+            r = results[key]
+            print(f"  {name:<9} {fmt:<5} {r['seconds'] * 1000:7.1f}ms/image {r['bytesPerImage'] / 1024:8.0f}KB/image")
+    return results
+
+
+def bench_face_search(sizes, repeat, queries=20):
+    """face_index.search_faces over a prebuilt faces_index.npz, as the deployed app loads it"""
+    import face_index
+
+    results = {}
+    deployed = face_index.FACE_INDEX_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            records = make_face_records(size)
+            probes = [records[i * len(records) // queries]['embeddings'][0] for i in range(queries)]
+            db_path = Path(tmp) / f'faces_db_{size}.json'
+            index_path = Path(tmp) / f'faces_index_{size}.npz'
+            with open(db_path, 'w') as f:
+                json.dump(records, f)
+            faces = face_index.build_face_index(str(db_path), str(index_path))
+            face_index.FACE_INDEX_FILE = str(index_path)
+
+            def run():
+                face_index._index = None  # Time the cold load too
+                start = time.perf_counter()
+                face_index.load_face_index()
+                load_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                for probe in probes:
+                    face_index.search_faces(probe)
+                query_seconds = (time.perf_counter() - start) / len(probes)
+
+                return {
+                    'seconds': round(query_seconds, 6),
+                    'loadSeconds': round(load_seconds, 4),
+                    'faces': faces
+                }
+
+            results[f'faces/{size}'] = best_of(repeat, run)
+            r = results[f'faces/{size}']
+            print(f"  face search {size:>6} photos: {r['seconds'] * 1000:.2f}ms/query "
+                  f"(index load {r['loadSeconds'] * 1000:.1f}ms)")
+    face_index.FACE_INDEX_FILE, face_index._index = deployed, None
+    return results
+
+
+def bench_duplicates(latency):
+    """Duplicate skipping through the upload pipeline: re-exports are skipped, a blink is not"""
+    from PIL import ImageDraw
+    import timeline
+    from upload_pipeline import UploadPipeline
+    from benchmarks.synthetic import make_image
+
+    photo = make_image(3000, 2000, seed=0)
+    blink = photo.copy()
+    ImageDraw.Draw(blink).ellipse((1400, 700, 1500, 760), fill=(30, 20, 20))  # Eyes closed
+    frames = [  # (file, image, width, quality, is a duplicate)
+        ('DSC_00001.JPG', photo, 3000, 92, False),
+        ('DSC_00001_small.JPG', photo, 1600, 75, True),  # The same photo exported again, smaller
+        ('DSC_00001_web.JPG', photo, 1200, 60, True),
+        ('DSC_00002.JPG', blink, 3000, 92, False),
+        ('DSC_00003.JPG', make_image(3000, 2000, seed=1), 3000, 92, False),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images = []
+        for name, img, width, quality, _ in frames:
+            path = Path(tmp) / name
+            img.resize((width, width * img.height // img.width)).save(path, format='JPEG', quality=quality)
+            images.append(path)
+        timeline.TIMELINE_FILE = str(Path(tmp) / 'timeline.jsonl')
+        pipeline = UploadPipeline('bench_duplicates',
+                                  uploaded_files=str(Path(tmp) / 'uploaded_files.txt'),
+                                  sessions_file=str(Path(tmp) / 'upload_sessions.json'))
+
+        with FakeCloudinary(latency=latency) as fake:
+            fake.configure_cloudinary()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                outcomes = [pipeline.process_single_image(path, i, len(images)) for i, path in enumerate(images, 1)]
+            seconds = time.perf_counter() - start
+
+    wrong = [name for (name, *_, expected), outcome in zip(frames, outcomes)
+             if bool(outcome.get('duplicate_of')) != expected]
+    print(f"  {sum(1 for o in outcomes if o.get('duplicate_of'))} of {len(frames)} skipped as duplicates"
+          + (f"  ✗ wrong: {', '.join(wrong)}" if wrong else "  ✓"))
+    return {'duplicates': {'seconds': round(seconds, 4), 'wrong': wrong}}
+
+
+def compare(current, baseline_path, threshold):
+    """Print per-scenario ratios against a previous run; return regressed scenarios"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+
+    regressions = []
+    print()
+    print(f"Compared with {baseline_path} ({baseline.get('gitCommit') or 'unknown commit'}):")
+    for key, result in sorted(current['results'].items()):
+        old = baseline.get('results', {}).get(key)
+        if not old or not old.get('seconds'):
+            print(f"  {key:<24} new")
+            continue
+        ratio = result['seconds'] / old['seconds']
+        marker = ''
+        if ratio > 1 + threshold:
+            marker = '  ⚠ REGRESSION'
+            regressions.append(key)
+        print(f"  {key:<24} {old['seconds']:.4f}s → {result['seconds']:.4f}s ({ratio:.2f}x){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmarks against a local Cloudinary stand-in')
+    parser.add_argument('--scenarios', nargs='+',
+                        default=['listing', 'upload', 'resumable', 'encode', 'faces', 'duplicates', 'coldstart'],
+                        choices=['listing', 'upload', 'resumable', 'encode', 'faces', 'duplicates', 'coldstart'])
+    parser.add_argument('--quick', action='store_true', help='Smaller sizes for a fast smoke run')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per scenario (fastest is kept)')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds added to each API call')
+    parser.add_argument('--bandwidth', type=float, default=5_000_000,
+                        help='Upload bandwidth per connection in bytes/s')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of upload calls that fail')
+    parser.add_argument('--drop-per-mb', type=float, default=0.05,
+                        help='Chance of a dropped connection per MB sent (resumable scenario)')
+    parser.add_argument('--images', type=int, default=16, help='Images per upload run')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='Previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    listing_sizes = (1_000, 5_000) if args.quick else LISTING_SIZES
+    face_sizes = (1_000, 5_000) if args.quick else FACE_DB_SIZES
+    worker_counts = (1, 4) if args.quick else UPLOAD_WORKERS
+    image_count = min(args.images, 4) if args.quick else args.images
+
+    report = {
+        'schema': RESULTS_SCHEMA,
+        'createdAt': datetime.now().isoformat(timespec='seconds'),
+        'gitCommit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'latency': args.latency,
+            'bandwidth': args.bandwidth,
+            'errorRate': args.error_rate,
+            'dropPerMb': args.drop_per_mb,
+            'quick': args.quick
+        },
+        'results': {}
+    }
+
+    if 'listing' in args.scenarios:
+        print("Gallery listing:")
+        report['results'].update(bench_listing(listing_sizes, args.latency, args.repeat))
+        report['results'].update(bench_listing_stream(listing_sizes, args.latency, args.repeat))
+    if 'upload' in args.scenarios:
+        print("Upload throughput:")
+        report['results'].update(bench_upload(worker_counts, image_count, args.latency,
+                                              args.bandwidth, args.error_rate, args.repeat))
+    if 'resumable' in args.scenarios:
+        print("Uploads over a dropping link:")
+        file_size = 2 * 1024 * 1024 if args.quick else 8 * 1024 * 1024
+        report['results'].update(bench_resumable(4, file_size, args.drop_per_mb, args.bandwidth * 10, args.latency))
+    if 'encode' in args.scenarios:
+        print("Encoding profiles:")
+        from encoding import available_formats
+        formats = ['JPEG'] if args.quick else available_formats()
+        report['results'].update(bench_encode(min(image_count, 4), formats, args.repeat))
+    if 'faces' in args.scenarios:
+        print("Face search:")
+        report['results'].update(bench_face_search(face_sizes, args.repeat))
+    if 'duplicates' in args.scenarios:
+        print("Duplicate detection:")
+        report['results'].update(bench_duplicates(args.latency))
+    if 'coldstart' in args.scenarios:
+        print("Cold start:")
+        report['results'].update(bench_cold_start(1_000, args.latency, max(args.repeat, 3)))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved: {args.output}")
+
+    # A wrong duplicate decision fails the run however fast it was
+    if report['results'].get('duplicates', {}).get('wrong'):
+        return 1
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
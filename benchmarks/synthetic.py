@@ -0,0 +1,73 @@
+import io
+import random
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter
+
+UPLOAD_FOLDER = 'wedding_photos'
+EMBEDDING_SIZE = 128  # Facenet embedding length
+
+
+def make_public_ids(count, folder=UPLOAD_FOLDER):
+    """Camera-style public_ids (DSC_00001 ...) under the gallery folder"""
+    return [f'{folder}/DSC_{i:05d}' for i in range(count)]
+
+
+def make_image(width=6000, height=4000, seed=0):
+    """Photo-like image: smooth gradients and shapes plus sensor noise.
+
+    Flat test images encode unrealistically fast, so this adds enough
+    detail for JPEG encode timings to be meaningful.
+    """
+    rng = random.Random(seed)
+    small = Image.new('RGB', (width // 8, height // 8))
+    draw = ImageDraw.Draw(small)
+    for _ in range(40):
+        x0, y0 = rng.randrange(small.width), rng.randrange(small.height)
+        x1, y1 = x0 + rng.randrange(20, 300), y0 + rng.randrange(20, 300)
+        draw.ellipse((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+    img = small.filter(ImageFilter.GaussianBlur(6)).resize((width, height), Image.Resampling.BILINEAR)
+
+    noise = Image.effect_noise((width, height), 24).convert('RGB')
+    return Image.blend(img, noise, 0.12)
+
+
+def make_jpeg_bytes(width=6000, height=4000, seed=0, quality=92):
+    buffer = io.BytesIO()
+    make_image(width, height, seed).save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def write_image_folder(folder, count, width=6000, height=4000):
+    """Write ``count`` synthetic camera JPEGs to ``folder`` and return their paths"""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    # Encoding is the slow part, so reuse a few distinct frames
+    frames = [make_jpeg_bytes(width, height, seed) for seed in range(min(count, 4))]
+
+    paths = []
+    for i in range(count):
+        path = folder / f'DSC_{i:05d}.JPG'
+        path.write_bytes(frames[i % len(frames)])
+        paths.append(path)
+    return paths
+
+
+def make_face_records(photo_count, faces_per_photo=3, seed=0):
+    """Records in the faces_db.json format with random unit-length embeddings"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(photo_count):
+        embeddings = []
+        for _ in range(rng.randint(1, faces_per_photo)):
+            vector = [rng.gauss(0, 1) for _ in range(EMBEDDING_SIZE)]
+            norm = sum(v * v for v in vector) ** 0.5
+            embeddings.append([v / norm for v in vector])
+        records.append({
+            'fileName': f'DSC_{i:05d}.JPG',
+            'publicId': f'DSC_{i:05d}',
+            'faceCount': len(embeddings),
+            'embeddings': embeddings
+        })
+    return records
@@ -0,0 +1,50 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from app import list_resources, photo_entry
+from manifest import MANIFEST_FILE, write_manifest
+from timeline import TIMELINE_FILE, load_timeline
+from face_index import FACES_DB_FILE, FACE_INDEX_FILE, build_face_index
+
+# Run at deploy time so the app can start without listing Cloudinary:
+#   python build_manifest.py
+
+
+def build():
+    print("=" * 60)
+    print("Building gallery manifest")
+    print("=" * 60)
+    print()
+
+    start = time.perf_counter()
+    # Photos uploaded while listing are picked up live by the app
+    built_at = datetime.now(timezone.utc)
+    resources = list_resources()
+    photos = [photo_entry(resource['public_id']) for resource in resources]
+
+    # Gallery order follows capture time when the timeline index exists
+    timeline = load_timeline()
+    if timeline is not None:
+        photos.sort(key=lambda photo: timeline.sort_key(photo['publicId']))
+        for photo in photos:
+            position = timeline.positions.get(photo['publicId'])
+            if position is not None:
+                photo['takenAt'] = timeline.entries[position]['takenAt']
+        print(f"🕒 Ordered by capture time ({len(timeline)} photos in {TIMELINE_FILE})")
+    write_manifest(photos, MANIFEST_FILE, built_at)
+    print(f"📷 {len(photos)} photos → {MANIFEST_FILE} ({time.perf_counter() - start:.1f}s)")
+
+    if os.path.exists(FACES_DB_FILE):
+        start = time.perf_counter()
+        faces = build_face_index(FACES_DB_FILE, FACE_INDEX_FILE)
+        print(f"👤 {faces} face encodings → {FACE_INDEX_FILE} ({time.perf_counter() - start:.1f}s)")
+    else:
+        print(f"No {FACES_DB_FILE} found, skipping face index")
+
+    print()
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    build()
@@ -2,6 +2,12 @@ import cloudinary
 import cloudinary.api
 from dotenv import load_dotenv
 import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from timeline import TIMELINE_FILE, load_timeline
 
 # Load environment variables
 load_dotenv()
@@ -13,60 +19,174 @@ cloudinary.config(
     api_secret=os.getenv('CLOUDINARY_API_SECRET')
 )
 
-print("=" * 60)
-print("Cloudinary Storage Usage Report")
-print("=" * 60)
-print()
+USAGE_HISTORY_FILE = 'usage_history.jsonl'  # One compact sample per line
+CACHE_SECONDS = 300  # Cloudinary refreshes usage slowly and rate-limits the Admin API
+POLL_INTERVAL = 600  # seconds between samples in --watch mode
+BURN_WINDOW_HOURS = 6  # Samples used for burn rates
+FULL_RESOLUTION_HOURS = 48  # Older samples are thinned to one per hour
+HISTORY_DAYS = 90
 
-try:
-    # Get usage statistics
+# Metrics tracked over time: usage and limit from the usage() response
+METRICS = ('storage', 'bandwidth', 'transformations', 'credits')
+
+
+def fetch_usage():
+    """One live usage() call, reduced to a compact sample"""
     usage = cloudinary.api.usage()
+    sample = {'t': int(time.time()), 'plan': usage.get('plan', 'Unknown'),
+              'resources': usage.get('resources', 0),
+              'resourcesLimit': usage.get('max_image_resources', 0)}
+    for metric in METRICS:
+        if isinstance(usage.get(metric), dict):
+            sample[metric] = usage[metric].get('usage', 0)
+            sample[f'{metric}Limit'] = usage[metric].get('limit', 0)
+    return sample
 
-    # Storage (in bytes)
-    storage_used = usage.get('storage', {}).get('usage', 0)
-    storage_limit = usage.get('storage', {}).get('limit', 0)
 
-    # Convert to MB and GB
-    storage_used_mb = storage_used / (1024 * 1024)
-    storage_used_gb = storage_used / (1024 * 1024 * 1024)
-    storage_limit_mb = storage_limit / (1024 * 1024)
-    storage_limit_gb = storage_limit / (1024 * 1024 * 1024)
+def load_history(path=USAGE_HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
 
-    # Calculate remaining
-    storage_remaining = storage_limit - storage_used
-    storage_remaining_mb = storage_remaining / (1024 * 1024)
-    storage_remaining_gb = storage_remaining / (1024 * 1024 * 1024)
 
-    # Calculate percentage
-    storage_percent = (storage_used / storage_limit *
-                       100) if storage_limit > 0 else 0
+def compact_history(samples, now=None):
+    """Keep recent samples, thin older ones to one per hour and drop expired ones"""
+    now = now or time.time()
+    kept = []
+    last_hour = None
+    for sample in samples:
+        age = now - sample['t']
+        if age > HISTORY_DAYS * 86400:
+            continue
+        if age > FULL_RESOLUTION_HOURS * 3600:
+            hour = sample['t'] // 3600
+            if hour == last_hour:
+                continue
+            last_hour = hour
+        kept.append(sample)
+    return kept
+
+
+def save_history(samples, path=USAGE_HISTORY_FILE):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        for sample in samples:
+            f.write(json.dumps(sample, separators=(',', ':')) + '\n')
+    os.replace(tmp_path, path)
+
+
+def get_usage(max_age=CACHE_SECONDS, path=USAGE_HISTORY_FILE):
+    """Latest sample, from the history if it is fresh enough; returns (history, cached)"""
+    history = load_history(path)
+    if history and time.time() - history[-1]['t'] < max_age:
+        return history, True
+
+    history.append(fetch_usage())
+    compacted = compact_history(history)
+    if len(compacted) == len(history):
+        with open(path, 'a') as f:
+            f.write(json.dumps(history[-1], separators=(',', ':')) + '\n')
+    else:
+        save_history(compacted, path)
+    return compacted, False
+
+
+def burn_rate(history, metric, window_hours=BURN_WINDOW_HOURS):
+    """Least-squares growth of a metric in units per hour, or None with too few samples.
+
+    Bandwidth and transformations reset every month, so only samples since the
+    last drop are used.
+    """
+    points = [(s['t'], s[metric]) for s in history if metric in s]
+    for i in range(len(points) - 1, 0, -1):
+        if points[i][1] < points[i - 1][1]:
+            points = points[i:]
+            break
+
+    if points:
+        cutoff = points[-1][0] - window_hours * 3600
+        points = [p for p in points if p[0] >= cutoff]
+    if len(points) < 2 or points[-1][0] == points[0][0]:
+        return None
+
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / len(points)
+    covariance = sum((t - mean_t) * (v - mean_v) for t, v in points)
+    variance = sum((t - mean_t) ** 2 for t, _ in points)
+    return covariance / variance * 3600
+
+
+def hours_to_limit(sample, metric, rate):
+    limit = sample.get(f'{metric}Limit') or 0
+    if not limit or not rate or rate <= 0:
+        return None
+    return max(0.0, (limit - sample[metric]) / rate)
+
+
+def format_bytes(value):
+    if abs(value) >= 1024 ** 3:
+        return f"{value / 1024 ** 3:.2f} GB"
+    return f"{value / 1024 ** 2:.1f} MB"
+
+
+def format_hours(hours):
+    if hours is None:
+        return "not growing"
+    if hours >= 48:
+        return f"{hours / 24:.1f} days"
+    return f"{hours:.1f} hours"
+
+
+def attribute_storage(by='sourceFolder'):
+    """Uploaded bytes and photo counts per folder or camera, from the local timeline"""
+    totals = {}
+    timeline = load_timeline()
+    for entry in timeline.entries if timeline else ():
+        key = entry.get(by) or 'Unknown'
+        total = totals.setdefault(key, {'photos': 0, 'bytes': 0})
+        total['photos'] += 1
+        total['bytes'] += entry.get('bytes', 0)
+    return totals
+
+
+def print_report(history, cached):
+    sample = history[-1]
+    taken = datetime.fromtimestamp(sample['t']).strftime('%H:%M:%S')
+
+    print("=" * 60)
+    print("Cloudinary Storage Usage Report")
+    print("=" * 60)
+    print(f"Sampled at {taken}" + (" (cached - use --refresh for a live call)" if cached else ""))
+    print()
+
+    # Storage (in bytes)
+    storage_used = sample.get('storage', 0)
+    storage_limit = sample.get('storageLimit', 0)
+    storage_remaining = storage_limit - storage_used
+    storage_percent = (storage_used / storage_limit * 100) if storage_limit > 0 else 0
 
     print("📊 STORAGE:")
-    print(f"  Used:      {storage_used_gb:.2f} GB ({storage_used_mb:.1f} MB)")
-    print(
-        f"  Limit:     {storage_limit_gb:.2f} GB ({storage_limit_mb:.1f} MB)")
-    print(
-        f"  Remaining: {storage_remaining_gb:.2f} GB ({storage_remaining_mb:.1f} MB)")
+    print(f"  Used:      {format_bytes(storage_used)}")
+    print(f"  Limit:     {format_bytes(storage_limit)}")
+    print(f"  Remaining: {format_bytes(storage_remaining)}")
     print(f"  Usage:     {storage_percent:.1f}%")
     print()
 
     # Bandwidth
-    bandwidth_used = usage.get('bandwidth', {}).get('usage', 0)
-    bandwidth_limit = usage.get('bandwidth', {}).get('limit', 0)
-    bandwidth_used_gb = bandwidth_used / (1024 * 1024 * 1024)
-    bandwidth_limit_gb = bandwidth_limit / (1024 * 1024 * 1024)
-    bandwidth_percent = (bandwidth_used / bandwidth_limit *
-                         100) if bandwidth_limit > 0 else 0
+    bandwidth_used = sample.get('bandwidth', 0)
+    bandwidth_limit = sample.get('bandwidthLimit', 0)
+    bandwidth_percent = (bandwidth_used / bandwidth_limit * 100) if bandwidth_limit > 0 else 0
 
     print("🌐 BANDWIDTH (Monthly):")
-    print(f"  Used:      {bandwidth_used_gb:.2f} GB")
-    print(f"  Limit:     {bandwidth_limit_gb:.2f} GB")
+    print(f"  Used:      {format_bytes(bandwidth_used)}")
+    print(f"  Limit:     {format_bytes(bandwidth_limit)}")
     print(f"  Usage:     {bandwidth_percent:.1f}%")
     print()
 
     # Resources count
-    resources = usage.get('resources', 0)
-    resources_limit = usage.get('max_image_resources', 0)
+    resources = sample.get('resources', 0)
+    resources_limit = sample.get('resourcesLimit', 0)
 
     print("📷 RESOURCES:")
     print(f"  Images:    {resources}")
@@ -76,34 +196,112 @@ try:
     print()
 
     # Transformations
-    transformations = usage.get('transformations', {}).get('usage', 0)
-    transformations_limit = usage.get('transformations', {}).get('limit', 0)
-
+    transformations = sample.get('transformations', 0)
+    transformations_limit = sample.get('transformationsLimit', 0)
     if transformations_limit > 0:
-        transformations_percent = (
-            transformations / transformations_limit * 100)
         print("🔄 TRANSFORMATIONS (Monthly):")
         print(f"  Used:      {transformations:,}")
         print(f"  Limit:     {transformations_limit:,}")
-        print(f"  Usage:     {transformations_percent:.1f}%")
+        print(f"  Usage:     {transformations / transformations_limit * 100:.1f}%")
         print()
 
+    # Burn rates from the local history
+    print(f"📈 BURN RATE (last {BURN_WINDOW_HOURS}h, {len(history)} samples):")
+    any_rate = False
+    for metric in METRICS:
+        if metric not in sample:
+            continue
+        rate = burn_rate(history, metric)
+        if rate is None:
+            continue
+        any_rate = True
+        per_hour = format_bytes(rate) if metric in ('storage', 'bandwidth') else f"{rate:,.1f}"
+        print(f"  {metric.capitalize():<16} {per_hour}/hour, limit in {format_hours(hours_to_limit(sample, metric, rate))}")
+    if not any_rate:
+        print("  Not enough samples yet - run again later or use --watch")
+    print()
+
     # Plan information
-    plan = usage.get('plan', 'Unknown')
-    print(f"💼 Plan: {plan}")
+    print(f"💼 Plan: {sample.get('plan', 'Unknown')}")
     print()
 
     # Check if running low on storage
+    storage_eta = hours_to_limit(sample, 'storage', burn_rate(history, 'storage'))
     if storage_percent > 90:
         print("⚠️  WARNING: Storage is over 90% full!")
     elif storage_percent > 75:
         print("⚠️  NOTICE: Storage is over 75% full")
+    elif storage_eta is not None and storage_eta < 24:
+        print(f"⚠️  NOTICE: Storage will be full in {format_hours(storage_eta)} at the current rate")
     else:
         print("✅ Storage usage is healthy")
 
     print()
     print("=" * 60)
 
-except Exception as e:
-    print(f"Error fetching usage data: {str(e)}")
-    print("\nMake sure your Cloudinary credentials are correct in .env file")
+
+def print_attribution(by, storage_used):
+    field = {'folder': 'sourceFolder', 'camera': 'camera'}[by]
+    totals = attribute_storage(field)
+    if not totals:
+        print(f"No upload index found ({TIMELINE_FILE}) - it is written by the upload scripts")
+        return
+
+    local_bytes = sum(t['bytes'] for t in totals.values())
+    print(f"💾 UPLOADED BYTES BY {by.upper()} (from {TIMELINE_FILE}):")
+    for key, total in sorted(totals.items(), key=lambda item: -item[1]['bytes']):
+        share = total['bytes'] / local_bytes * 100 if local_bytes else 0
+        print(f"  {key:<24} {total['photos']:>6} photos  {format_bytes(total['bytes']):>10}  {share:5.1f}%")
+    if storage_used:
+        print(f"  Indexed uploads cover {local_bytes / storage_used * 100:.1f}% of Cloudinary storage")
+    print()
+
+
+def watch(interval):
+    """Sample on an interval and print one line per sample"""
+    print(f"Polling usage every {interval}s (Ctrl+C to stop)")
+    while True:
+        try:
+            history, cached = get_usage(max_age=interval)
+            sample = history[-1]
+            rate = burn_rate(history, 'storage')
+            line = f"{datetime.fromtimestamp(sample['t']).strftime('%H:%M:%S')}  storage {format_bytes(sample.get('storage', 0))}"
+            if rate is not None:
+                line += f"  +{format_bytes(rate)}/h  full in {format_hours(hours_to_limit(sample, 'storage', rate))}"
+            print(line)
+        except Exception as e:
+            print(f"  ✗ Error fetching usage data: {str(e)}")
+        time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cloudinary usage report with burn rates')
+    parser.add_argument('--refresh', action='store_true', help='Ignore the cached sample')
+    parser.add_argument('--watch', action='store_true', help='Keep polling and recording samples')
+    parser.add_argument('--interval', type=int, default=POLL_INTERVAL, help='Seconds between polls')
+    parser.add_argument('--by', choices=['folder', 'camera'], help='Attribute uploaded bytes locally')
+    args = parser.parse_args(argv)
+
+    if args.watch:
+        try:
+            watch(args.interval)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        history, cached = get_usage(max_age=0 if args.refresh else CACHE_SECONDS)
+    except Exception as e:
+        print(f"Error fetching usage data: {str(e)}")
+        print("\nMake sure your Cloudinary credentials are correct in .env file")
+        return 1
+
+    print_report(history, cached)
+    if args.by:
+        print()
+        print_attribution(args.by, history[-1].get('storage', 0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import cloudinary.uploader
+
+# Resumable uploads for slow or flaky links. Large files (or files that would
+# take too long at the measured link speed) are sent in chunks with
+# Content-Range / X-Unique-Upload-Id, the same protocol as
+# cloudinary.uploader.upload_large. Acknowledged offsets are saved after every
+# chunk, so a failed chunk is retried on its own and a re-run of the script
+# continues mid-file instead of starting over.
+
+UPLOAD_SESSIONS_FILE = 'upload_sessions.json'
+MIN_CHUNK_SIZE = 5 * 1024 * 1024  # Cloudinary rejects smaller chunks (except the last)
+MAX_CHUNK_SIZE = 20 * 1024 * 1024  # upload_large's default chunk size
+LARGE_FILE_SIZE = 20 * 1024 * 1024  # Always chunk above this
+CHUNK_SECONDS = 10  # Target send time per chunk at the measured throughput
+SINGLE_SHOT_FRACTION = 0.33  # Chunk when a single shot would need this share of the timeout
+DEFAULT_THROUGHPUT = 1024 * 1024  # bytes/s assumed until the first upload is measured
+CHUNK_RETRIES = 5
+CHUNK_RETRY_DELAY = 1  # seconds, doubled after each failed attempt
+SESSION_MAX_AGE = 24 * 3600  # Cloudinary discards unfinished uploads; don't resume older ones
+
+
+class ThroughputMeter:
+    """Smoothed upload throughput in bytes per second"""
+
+    def __init__(self, initial=None, weight=0.3):
+        self.value = initial
+        self.weight = weight
+        self.lock = threading.Lock()
+
+    def record(self, nbytes, seconds):
+        if seconds <= 0:
+            return
+        rate = nbytes / seconds
+        with self.lock:
+            self.value = rate if self.value is None else self.weight * rate + (1 - self.weight) * self.value
+
+    def get(self, default=DEFAULT_THROUGHPUT):
+        with self.lock:
+            return self.value or default
+
+
+class UploadSessions:
+    """Chunked uploads in progress, persisted as JSON after every acknowledged chunk"""
+
+    def __init__(self, path=UPLOAD_SESSIONS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.sessions = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.sessions = json.load(f)
+
+    def get(self, key):
+        with self.lock:
+            session = self.sessions.get(key)
+            return dict(session) if session else None
+
+    def save(self, key, session):
+        with self.lock:
+            self.sessions[key] = dict(session, updatedAt=time.time())
+            self._write()
+
+    def remove(self, key):
+        with self.lock:
+            if self.sessions.pop(key, None) is not None:
+                self._write()
+
+    def _write(self):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.sessions, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class ResumableUploader:
+    """Upload a buffer in one request or in resumable chunks, whichever suits the link"""
+
+    def __init__(self, sessions_file=UPLOAD_SESSIONS_FILE, mode='auto', stats=None,
+                 min_chunk_size=MIN_CHUNK_SIZE, max_chunk_size=MAX_CHUNK_SIZE,
+                 retry_delay=CHUNK_RETRY_DELAY):
+        self.sessions = UploadSessions(sessions_file)
+        self.mode = mode  # 'auto', 'single' or 'chunked'
+        self.stats = stats
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.retry_delay = retry_delay
+        self.throughput = ThroughputMeter()
+
+    def choose(self, size, timeout=60):
+        """'single' or 'chunked' for a file of ``size`` bytes at the measured throughput"""
+        if self.mode != 'auto':
+            return self.mode
+        if size <= self.min_chunk_size:
+            return 'single'  # Can't be split into valid chunks
+        if size >= LARGE_FILE_SIZE:
+            return 'chunked'
+        expected_seconds = size / self.throughput.get()
+        return 'chunked' if expected_seconds > timeout * SINGLE_SHOT_FRACTION else 'single'
+
+    def chunk_size(self):
+        size = int(self.throughput.get() * CHUNK_SECONDS)
+        return max(self.min_chunk_size, min(self.max_chunk_size, size))
+
+    def upload(self, buffer, folder, public_id, timeout=60, **options):
+        """Upload a BytesIO like cloudinary.uploader.upload and return its result"""
+        data = buffer.getvalue()
+        key = f'{folder}/{public_id}'
+        digest = hashlib.sha1(data).hexdigest()
+
+        # An unfinished session for these exact bytes always resumes
+        session = self.sessions.get(key)
+        if session and (session['sha1'] != digest or time.time() - session['updatedAt'] > SESSION_MAX_AGE):
+            self.sessions.remove(key)
+            session = None
+
+        if session is None and self.choose(len(data), timeout) == 'single':
+            start = time.perf_counter()
+            result = cloudinary.uploader.upload(
+                buffer, folder=folder, public_id=public_id, timeout=timeout, **options
+            )
+            self.throughput.record(len(data), time.perf_counter() - start)
+            return result
+
+        if session is None:
+            session = {
+                'uploadId': uuid.uuid4().hex,
+                'sha1': digest,
+                'size': len(data),
+                'offset': 0,
+                'startedAt': datetime.now().isoformat(timespec='seconds')
+            }
+            self.sessions.save(key, session)
+        elif self.stats:
+            self.stats.count('resumed_uploads')
+
+        return self._upload_chunks(data, key, session, folder=folder, public_id=public_id,
+                                   timeout=timeout, **options)
+
+    def _upload_chunks(self, data, key, session, **options):
+        total = len(data)
+        result = None
+
+        while session['offset'] < total:
+            start = session['offset']
+            end = min(total, start + self.chunk_size())
+            if total - end < self.min_chunk_size:
+                end = total  # Don't leave a final chunk below the minimum size
+
+            result = self._send_chunk(data[start:end], start, total, session['uploadId'], options)
+            session['offset'] = end
+            if end < total:
+                self.sessions.save(key, session)
+
+        self.sessions.remove(key)
+        return result
+
+    def _send_chunk(self, chunk, start, total, upload_id, options):
+        headers = {
+            'Content-Range': f'bytes {start}-{start + len(chunk) - 1}/{total}',
+            'X-Unique-Upload-Id': upload_id
+        }
+
+        for attempt in range(CHUNK_RETRIES):
+            try:
+                began = time.perf_counter()
+                result = cloudinary.uploader.upload_large_part(
+                    (options['public_id'], chunk), http_headers=headers, **options
+                )
+                elapsed = time.perf_counter() - began
+                self.throughput.record(len(chunk), elapsed)
+                if self.stats:
+                    self.stats.record('upload_chunk', elapsed)
+                return result
+            except Exception:
+                if attempt == CHUNK_RETRIES - 1:
+                    raise  # Offset is saved - the next attempt resumes here
+                if self.stats:
+                    self.stats.count('chunk_retries')
+                time.sleep(self.retry_delay * 2 ** attempt)
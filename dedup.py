@@ -0,0 +1,198 @@
+import base64
+import threading
+from datetime import datetime
+
+# Perceptual hashes for spotting repeated frames. Pillow is only needed by
+# dhash() and thumbprint(), which callers hand an image they have already
+# decoded.
+
+DHASH_SIZE = 8  # 8x8 gradient bits = 64-bit hash
+DUPLICATE_DISTANCE = 6  # Bits apart before the thumbprints are compared; re-exports land within 3
+THUMBPRINT_SIZE = 24  # Greyscale thumbnail side compared to confirm a duplicate
+THUMBPRINT_TOLERANCE = 12  # Max grey levels any thumbnail pixel may differ; a blink is 20+
+BURST_DISTANCE = 12  # Bits apart for neighbouring frames of a burst
+BURST_WINDOW = 2.0  # Max seconds between frames of a burst
+
+
+def dhash(img):
+    """Difference hash of a decoded PIL image, as a 64-bit int"""
+    from PIL import Image
+
+    # Box-filter down to 9x8 first so the greyscale conversion touches 72 pixels
+    small = img.resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.BOX).convert('L')
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def thumbprint(img):
+    """Box-filtered greyscale thumbnail of a decoded PIL image, base64-encoded.
+
+    The fixed filter averages away resampling and re-encoding, so the same
+    photo exported at another size or quality gives nearly the same bytes,
+    while a local change such as a blink still moves a few pixels a lot.
+    """
+    from PIL import Image
+
+    small = img.resize((THUMBPRINT_SIZE, THUMBPRINT_SIZE), Image.Resampling.BOX).convert('L')
+    return base64.b64encode(small.tobytes()).decode('ascii')
+
+
+def thumbprint_distance(a, b):
+    """Largest per-pixel grey level difference between two thumbprints"""
+    a, b = base64.b64decode(a), base64.b64decode(b)
+    if len(a) != len(b):
+        return 255
+    return max(abs(x - y) for x, y in zip(a, b))
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance, for near-neighbour hash lookups"""
+
+    def __init__(self):
+        self.root = None  # [hash, keys, {distance: child}]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, value, key):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [key], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [key], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """(distance, key) pairs within max_distance, closest first"""
+        if self.root is None:
+            return []
+
+        matches = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                matches.extend((distance, key) for key in node[1])
+            # Triangle inequality: only children in [d - max, d + max] can match
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(matches)
+
+
+class DuplicateIndex:
+    """Thread-safe hash index the upload workers use to skip repeated frames.
+
+    A hash match only counts when the thumbprints agree too, so the same photo
+    exported at another size or quality is caught, while photos that merely
+    look alike (a blink, a shifted hand) are still uploaded. A
+    match whose upload is still in flight is waited for: the duplicate is
+    only skipped once that upload is confirmed, and claims the slot itself if
+    the upload is released.
+    """
+
+    def __init__(self, max_distance=DUPLICATE_DISTANCE):
+        self.max_distance = max_distance
+        self.tree = BKTree()
+        self.active = {}  # public id -> (hash, thumbprint); released ids stay in the tree but are ignored
+        self.pending = set()  # claimed ids whose upload isn't confirmed yet
+        self.changed = threading.Condition()
+
+    @classmethod
+    def from_timeline(cls, max_distance=DUPLICATE_DISTANCE):
+        """Seed the index with every hashed photo already in the timeline"""
+        from timeline import load_timeline
+
+        index = cls(max_distance)
+        timeline = load_timeline()
+        for entry in timeline.entries if timeline else ():
+            # Entries without a thumbprint can't be confirmed, so never match
+            if entry.get('phash') and entry.get('thumbprint'):
+                index.active[entry['publicId']] = (int(entry['phash'], 16), entry['thumbprint'])
+                index.tree.add(int(entry['phash'], 16), entry['publicId'])
+        return index
+
+    def claim(self, value, thumb, public_id):
+        """Return the uploaded photo this one duplicates, or reserve it and return None"""
+        with self.changed:
+            while True:
+                match = self._match(value, thumb, public_id)
+                if match is None or match not in self.pending:
+                    break
+                # Still uploading on another worker: wait for confirm() or release()
+                self.changed.wait()
+            if match is not None:
+                return match
+
+            previous = self.active.get(public_id)
+            self.active[public_id] = (value, thumb)
+            self.pending.add(public_id)
+            if previous is None or previous[0] != value:
+                self.tree.add(value, public_id)
+            return None
+
+    def _match(self, value, thumb, public_id):
+        for distance, key in self.tree.search(value, self.max_distance):
+            if (key != public_id and key in self.active
+                    and thumbprint_distance(self.active[key][1], thumb) <= THUMBPRINT_TOLERANCE):
+                return key
+        return None
+
+    def confirm(self, public_id):
+        """Mark a claimed photo as uploaded, so its duplicates can be skipped"""
+        with self.changed:
+            self.pending.discard(public_id)
+            self.changed.notify_all()
+
+    def release(self, public_id):
+        """Forget a claimed photo whose upload failed"""
+        with self.changed:
+            self.active.pop(public_id, None)
+            self.pending.discard(public_id)
+            self.changed.notify_all()
+
+
+def group_bursts(entries, window=BURST_WINDOW, max_distance=BURST_DISTANCE):
+    """Split capture-ordered timeline entries into bursts (lists of public ids)"""
+    groups = []
+    open_bursts = {}  # camera -> (group, last frame time, last frame hash)
+
+    for entry in entries:
+        taken_at = datetime.fromisoformat(entry['takenAt'])
+        value = int(entry['phash'], 16) if entry.get('phash') else None
+        camera = entry.get('camera')
+        current = open_bursts.get(camera)
+
+        if (current is not None and value is not None and current[2] is not None
+                and (taken_at - current[1]).total_seconds() <= window
+                and hamming(value, current[2]) <= max_distance):
+            group = current[0]
+            group.append(entry['publicId'])
+        else:
+            group = [entry['publicId']]
+            groups.append(group)
+        open_bursts[camera] = (group, taken_at, value)
+
+    return groups
@@ -0,0 +1,102 @@
+import io
+
+from PIL import Image, ImageOps, features
+
+# Encoding profiles for the upload scripts, trading encode CPU against upload size.
+# py -m benchmarks.run_benchmarks --scenarios encode measures each one.
+
+TAG_ORIENTATION = 0x0112
+
+PROFILES = {
+    # Cheapest to compute: bilinear resize, baseline JPEG, no extra Huffman pass
+    'fast': {
+        'resample': Image.Resampling.BILINEAR,
+        'quality': 85,
+        'optimize': False,
+        'progressive': False,
+        'subsampling': '4:2:0',
+        'webp_method': 2,
+        'avif_speed': 8
+    },
+    # Progressive JPEG gets optimized Huffman tables as part of the scan, so it
+    # is usually smaller than optimize=True at a fraction of the cost
+    'balanced': {
+        'resample': Image.Resampling.BICUBIC,
+        'quality': 85,
+        'optimize': False,
+        'progressive': True,
+        'subsampling': '4:2:0',
+        'webp_method': 4,
+        'avif_speed': 6
+    },
+    # Smallest uploads: sharpest resize, lower quality and every size optimization
+    'smallest': {
+        'resample': Image.Resampling.LANCZOS,
+        'quality': 78,
+        'optimize': True,
+        'progressive': True,
+        'subsampling': '4:2:0',
+        'webp_method': 6,
+        'avif_speed': 4
+    }
+}
+
+# Output formats and the Pillow feature each one needs
+FORMATS = {'JPEG': None, 'WEBP': 'webp', 'AVIF': 'avif'}
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown encoding profile '{name}' (choose from {', '.join(PROFILES)})")
+
+
+def available_formats():
+    """Output formats this Pillow build can write"""
+    return [fmt for fmt, feature in FORMATS.items() if feature is None or features.check(feature)]
+
+
+def check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}' (choose from {', '.join(FORMATS)})")
+    if fmt not in available_formats():
+        raise ValueError(f"This Pillow build can't write {fmt} - install a build with {FORMATS[fmt]} support")
+
+
+def upright(img):
+    """Rotate the pixels to match the EXIF orientation tag"""
+    if img.getexif().get(TAG_ORIENTATION, 1) == 1:
+        return img  # Most photos - skip the copy exif_transpose would make
+    return ImageOps.exif_transpose(img)
+
+
+def resize(img, target_size, profile):
+    """Shrink to fit target_size with the profile's filter, then fix orientation"""
+    img.thumbnail(target_size, profile['resample'])
+    # Rotating after the resize moves a quarter of the pixels; TARGET_SIZE is square
+    return upright(img)
+
+
+def encode_image(img, profile, fmt='JPEG'):
+    """Encode to a new buffer without EXIF/XMP (GPS, serial numbers); the ICC profile is kept"""
+    buffer = io.BytesIO()
+    options = {'icc_profile': img.info.get('icc_profile')}
+
+    if fmt == 'JPEG':
+        options.update(
+            quality=profile['quality'],
+            optimize=profile['optimize'],
+            progressive=profile['progressive'],
+            subsampling=profile['subsampling']
+        )
+    elif fmt == 'WEBP':
+        options.update(quality=profile['quality'], method=profile['webp_method'])
+    elif fmt == 'AVIF':
+        options.update(quality=profile['quality'] - 20, speed=profile['avif_speed'])  # AVIF's scale runs lower
+    else:
+        check_format(fmt)
+
+    img.save(buffer, format=fmt, **options)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+
+# numpy is imported on first use so the web app starts without it
+
+FACES_DB_FILE = os.getenv('FACES_DB_FILE', 'faces_db.json')
+FACE_INDEX_FILE = os.getenv('FACE_INDEX_FILE', 'faces_index.npz')
+FACE_TOLERANCE = 0.80  # DeepFace's Facenet threshold for euclidean_l2 (distance between unit-length embeddings)
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _normalize(vectors):
+    """Scale embeddings to unit length; raw Facenet distances run into the tens"""
+    import numpy as np
+
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _read_faces_db(faces_db_path):
+    """Flatten faces_db.json into unit-length float32 encodings and the photo id of each"""
+    import numpy as np
+
+    with open(faces_db_path, 'r') as f:
+        records = json.load(f)
+
+    encodings = [e for r in records for e in r['embeddings']]
+    owners = [r['publicId'] for r in records for _ in r['embeddings']]
+    encodings = np.array(encodings, dtype=np.float32).reshape(len(encodings), -1)
+    return _normalize(encodings), np.array(owners)
+
+
+def build_face_index(faces_db_path=FACES_DB_FILE, index_path=FACE_INDEX_FILE):
+    """Write the prebuilt .npz index bundled at deploy time"""
+    import numpy as np
+
+    encodings, owners = _read_faces_db(faces_db_path)
+    np.savez(index_path, encodings=encodings, owners=owners)
+    return len(encodings)
+
+
+def load_face_index():
+    """Load the prebuilt index once, falling back to faces_db.json"""
+    global _index
+    if _index is not None:
+        return _index
+
+    with _index_lock:
+        if _index is None:
+            import numpy as np
+
+            if os.path.exists(FACE_INDEX_FILE):
+                # Written normalized by build_face_index
+                with np.load(FACE_INDEX_FILE) as data:
+                    _index = (data['encodings'], data['owners'])
+            else:
+                # Slower path - parse the JSON database (read-only filesystems can't cache it)
+                _index = _read_faces_db(FACES_DB_FILE)
+    return _index
+
+
+def search_faces(embedding, tolerance=FACE_TOLERANCE):
+    """Photos containing a face within ``tolerance`` (euclidean_l2) of the embedding, closest first"""
+    import numpy as np
+
+    encodings, owners = load_face_index()
+    if len(encodings) == 0:
+        return []
+
+    probe = _normalize(np.asarray(embedding, dtype=np.float32))
+    distances = np.linalg.norm(encodings - probe, axis=1)
+
+    best = {}
+    for i in np.flatnonzero(distances <= tolerance):
+        owner = str(owners[i])
+        distance = float(distances[i])
+        if owner not in best or distance < best[owner]:
+            best[owner] = distance
+
+    return sorted(best.items(), key=lambda item: item[1])
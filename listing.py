@@ -0,0 +1,154 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# The Admin API only pages forward through a cursor, so listing N photos is
+# N/500 round trips one after another. Splitting the folder into public_id
+# prefixes gives independent cursors that can be walked side by side. Prefixes
+# are planned from ids we already know (the upload timeline); photos outside
+# them are caught by comparing with a Search API count, and only that
+# difference is fetched.
+
+LISTING_CONCURRENCY = 8  # Admin API calls in flight; each one counts against the hourly rate limit
+PAGE_SIZE = 500  # Admin API maximum
+PARTITION_SIZE = 2 * PAGE_SIZE  # Known photos per prefix before it is split further
+MAX_IDS_PER_CALL = 100  # resources_by_ids limit
+
+
+def plan_partitions(names, target=PARTITION_SIZE):
+    """Split known names (public_ids without the folder) into prefixes of about ``target`` photos.
+
+    Returns (prefixes, exact): sorted prefixes, plus names that equal a prefix
+    that was split further (IMG_1 next to IMG_10) and so match no partition.
+    Every prefix comes from a known name, so no listing call is spent on an
+    empty partition; names outside them are left to iter_listing's fetch_outside.
+    """
+    prefixes, exact = [], []
+
+    def split(prefix, group):
+        if len(group) <= target:
+            prefixes.append(prefix)
+            return
+        depth = len(prefix)
+        children = {}
+        for name in group:
+            if len(name) == depth:
+                exact.append(name)
+            else:
+                children.setdefault(name[depth], []).append(name)
+        for char in sorted(children):
+            split(prefix + char, children[char])
+
+    split('', sorted(set(names)))
+    return prefixes, exact
+
+
+def walk(prefix, fetch_page):
+    """Yield each page of one prefix, following its cursor"""
+    cursor = None
+    while True:
+        result = fetch_page(prefix, cursor)
+        yield result['resources']
+        cursor = result.get('next_cursor')
+        if not cursor:
+            return
+
+
+def iter_listing(prefix, fetch_page, known_names=(), fetch_ids=None, count_total=None,
+                 fetch_outside=None, concurrency=LISTING_CONCURRENCY):
+    """Yield batches of resources under ``prefix`` as they arrive, partitions in public_id order.
+
+    fetch_page(prefix, cursor) returns one Admin API page, fetch_ids(public_ids)
+    a list of resources and count_total() the number of photos under the prefix
+    (None if it can't be counted). When the count is higher than what the
+    partitions returned, fetch_outside(prefixes, exact) supplies the photos
+    outside them (the names are relative to ``prefix``), yielded last. The
+    leading partition is yielded page by page while the ones after it are
+    fetched; without known names to split on this is a plain cursor walk.
+    """
+    prefixes, exact = plan_partitions(known_names)
+    if prefixes == [''] or fetch_ids is None:
+        yield from walk(prefix, fetch_page)
+        return
+
+    stopped = threading.Event()
+
+    def pump(partition, pages):
+        # Pages go to the consumer as they land, then None (or the error)
+        try:
+            for page in walk(prefix + partition, fetch_page):
+                pages.put(page)
+                if stopped.is_set():
+                    break
+            pages.put(None)
+        except Exception as e:
+            pages.put(e)
+
+    # Partitions and exact names share one ordering: IMG_1 < IMG_10... < IMG_2...
+    keys = sorted(prefixes + exact)
+    seen = set()
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        count_future = pool.submit(count_total) if count_total else None
+
+        # Start the work in key order so the pool picks up the leading partitions first
+        jobs = [(partition, partition) for partition in prefixes]
+        jobs += [(exact[i], exact[i:i + MAX_IDS_PER_CALL]) for i in range(0, len(exact), MAX_IDS_PER_CALL)]
+        queues, batches = {}, {}
+        for _, key in sorted(jobs, key=lambda job: job[0]):
+            if isinstance(key, list):
+                future = pool.submit(fetch_ids, [prefix + name for name in key])
+                batches.update((name, future) for name in key)
+            else:
+                queues[key] = queue.Queue()
+                pool.submit(pump, key, queues[key])
+
+        for key in keys:
+            if key in batches:
+                found = [resource for resource in batches.pop(key).result()
+                         if resource['public_id'] == prefix + key]
+                seen.update(resource['public_id'] for resource in found)
+                if found:
+                    yield found
+                continue
+
+            pages = queues.pop(key)
+            while True:
+                page = pages.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                seen.update(resource['public_id'] for resource in page)
+                if page:
+                    yield page
+
+        try:
+            total = count_future.result() if count_future else None
+        except Exception:
+            total = None
+    finally:
+        stopped.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if total is not None and total <= len(seen):
+        return
+
+    # Photos the timeline doesn't know about yet (or no count to check against)
+    if fetch_outside is not None:
+        try:
+            outside = fetch_outside(prefixes, exact)
+        except Exception:
+            outside = None
+        if outside is not None:
+            missing = [resource for resource in outside if resource['public_id'] not in seen]
+            if missing:
+                yield sorted(missing, key=lambda resource: resource['public_id'])
+            return
+
+    # Nothing can fetch just the difference: sweep the whole folder
+    for page in walk(prefix, fetch_page):
+        missing = [resource for resource in page if resource['public_id'] not in seen]
+        if missing:
+            yield missing
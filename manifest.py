@@ -0,0 +1,62 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+# Gallery listing prebuilt at deploy time by build_manifest.py
+MANIFEST_FILE = os.getenv('MANIFEST_FILE', 'manifest.json')
+
+
+class Manifest:
+    """Photo list loaded from the manifest file, with the /api/photos body pre-encoded"""
+
+    def __init__(self, photos, built_at, mtime):
+        self.photos = photos
+        self.by_id = {photo['publicId']: photo for photo in photos}
+        self.built_at = built_at
+        self.mtime = mtime
+        self.body = json.dumps({'success': True, 'photos': photos, 'total': len(photos)}).encode()
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def load_manifest(path=None):
+    """Return the current manifest, reloading it if the file changed; None if there is none"""
+    global _manifest
+    path = path or MANIFEST_FILE
+
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    if _manifest is not None and _manifest.mtime == mtime:
+        return _manifest
+
+    with _manifest_lock:
+        if _manifest is None or _manifest.mtime != mtime:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            _manifest = Manifest(data['photos'], data.get('builtAt'), mtime)
+        return _manifest
+
+
+def write_manifest(photos, path=None, built_at=None):
+    """Atomically write the manifest so a running app never reads a partial file.
+
+    built_at is when the listing behind ``photos`` started (UTC, defaults to
+    now); the app looks up photos uploaded after it live.
+    """
+    path = path or MANIFEST_FILE
+    built_at = built_at or datetime.now(timezone.utc)
+    data = {
+        'builtAt': built_at.astimezone(timezone.utc).isoformat(timespec='seconds'),
+        'total': len(photos),
+        'photos': photos
+    }
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
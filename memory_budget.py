@@ -0,0 +1,96 @@
+import ctypes
+import ctypes.util
+import math
+import sys
+import threading
+from collections import deque
+
+# Decoded pixels dominate the uploader's memory. Workers reserve an estimate
+# of each image's footprint before decoding, so a batch of panoramas waits
+# for memory instead of running out of it.
+
+DECODE_OVERHEAD = 2  # Decoded image plus one same-sized copy (mode conversion, rotation)
+MALLOC_ARENAS = 2  # glibc arenas shared by the worker threads
+M_ARENA_MAX = -8  # mallopt() parameter from <malloc.h>
+
+
+class MemoryBudget:
+    """Byte-weighted semaphore; reservations are granted in arrival order"""
+
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self.used = 0
+        self.peak = 0
+        self.waiting = deque()
+        self.condition = threading.Condition()
+
+    def acquire(self, nbytes):
+        """Block until nbytes fit in the budget; an oversized image runs on its own"""
+        ticket = object()
+        with self.condition:
+            self.waiting.append(ticket)
+            # FIFO so a large image isn't starved by a stream of small ones
+            while self.waiting[0] is not ticket or (self.used and self.used + nbytes > self.limit):
+                self.condition.wait()
+            self.waiting.popleft()
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+            self.condition.notify_all()
+
+    def release(self, nbytes):
+        with self.condition:
+            self.used -= nbytes
+            self.condition.notify_all()
+
+
+def limit_malloc_arenas(arenas=MALLOC_ARENAS):
+    """Stop glibc giving every worker thread its own heap (same as MALLOC_ARENA_MAX).
+
+    Freed pixel buffers stay in the arena of the thread that decoded them, so
+    with one arena per worker the process keeps the peak of every thread and
+    RSS ends up far above the budget. Call before starting the workers; a
+    no-op off Linux.
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'))
+        return bool(libc.mallopt(M_ARENA_MAX, arenas))
+    except (OSError, AttributeError):
+        return False  # Not glibc (e.g. musl)
+
+
+def bytes_per_pixel(mode):
+    """Pillow's in-memory pixel size (RGB is stored as 4 bytes)"""
+    if mode in ('1', 'L', 'P'):
+        return 1
+    if mode.startswith('I;16'):
+        return 2
+    return 4
+
+
+def draft_size(size, target_size):
+    """Size to request from JPEG draft: twice the final thumbnail, keeping the aspect ratio"""
+    scale = max(size[0] / target_size[0], size[1] / target_size[1])
+    if scale <= 2:
+        return None
+    return (math.ceil(size[0] / scale) * 2, math.ceil(size[1] / scale) * 2)
+
+
+def decode_footprint(img, file_bytes=0):
+    """Estimated peak bytes to decode an opened (not yet loaded) image"""
+    pixels = img.size[0] * img.size[1]
+    return file_bytes + pixels * bytes_per_pixel(img.mode) * DECODE_OVERHEAD
+
+
+def reduce_decoded(img, target_size):
+    """Box-reduce a decoded image that is still far larger than needed.
+
+    JPEGs are already reduced by draft(); other formats (PNG panoramas)
+    decode at full size, so drop to about twice the output size straight away
+    instead of carrying the full-size pixels through conversion and resizing.
+    """
+    factor = int(max(img.size[0] / target_size[0], img.size[1] / target_size[1]) / 2)
+    if factor < 2 or img.mode in ('1', 'P') or img.mode.startswith('I;16'):
+        return img  # reduce() can't handle these modes; thumbnail() still works
+    return img.reduce(factor)
@@ -0,0 +1,232 @@
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+# Latency bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Opt-in sampling profiler for slow requests
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', 0))  # 0 disables profiling
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.1))  # Fraction of requests sampled
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+PROFILE_OUTPUT = os.getenv('PROFILE_OUTPUT', 'slow_requests.folded')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels"""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            items = sorted((labels, list(series)) for labels, series in self.series.items())
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                label_str = _format_labels(self.label_names + ('le',), labels + (bound,))
+                lines.append(f'{self.name}_bucket{label_str} {count}')
+            label_str = _format_labels(self.label_names + ('le',), labels + ('+Inf',))
+            lines.append(f'{self.name}_bucket{label_str} {series[-1]}')
+            label_str = _format_labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{label_str} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{label_str} {series[-1]}')
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter with labels"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self.lock:
+            items = sorted(self.series.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route', ('route', 'method'))
+REQUESTS = Counter(
+    'http_requests_total', 'Requests by route and status', ('route', 'method', 'status'))
+STAGE_LATENCY = Histogram(
+    'app_stage_duration_seconds', 'Time spent in named stages of a request', ('route', 'stage'))
+UPSTREAM_LATENCY = Histogram(
+    'upstream_request_duration_seconds', 'Latency of calls to external services', ('call',))
+UPSTREAM_CALLS = Counter(
+    'upstream_requests_total', 'Calls to external services by outcome', ('call', 'outcome'))
+
+ALL_METRICS = (REQUEST_LATENCY, REQUESTS, STAGE_LATENCY, UPSTREAM_LATENCY, UPSTREAM_CALLS)
+
+
+def _current_route():
+    try:
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+    except RuntimeError:
+        return 'background'  # Outside of a request
+
+
+@contextmanager
+def timed_stage(stage, route=None):
+    """Time a stage of the current request (e.g. listing vs URL building)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe((route or _current_route(), stage), time.perf_counter() - start)
+
+
+@contextmanager
+def timed_upstream(call):
+    """Count and time a call to an external service such as the Cloudinary Admin API"""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        UPSTREAM_LATENCY.observe((call,), time.perf_counter() - start)
+        UPSTREAM_CALLS.inc((call, outcome))
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered request threads from a background thread.
+
+    Stacks of requests slower than the threshold are appended to a file in
+    the collapsed ("folded") format used by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, slow_seconds, interval, output_path):
+        self.slow_seconds = slow_seconds
+        self.interval = interval
+        self.output_path = output_path
+        self.lock = threading.Lock()
+        self.active = {}  # thread id -> {stack: sample count}
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def begin(self, thread_id):
+        with self.lock:
+            self.active[thread_id] = {}
+
+    def end(self, thread_id, label, duration):
+        with self.lock:
+            stacks = self.active.pop(thread_id, None)
+        if not stacks or duration < self.slow_seconds:
+            return
+        with self.lock, open(self.output_path, 'a') as f:
+            for stack, count in stacks.items():
+                f.write(f'{label};{stack} {count}\n')
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stack = self._collapse(frame)
+                    stacks[stack] = stacks.get(stack, 0) + 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+def render_metrics():
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app):
+    """Record per-route latency for every request and serve /metrics"""
+    profiler = None
+    if PROFILE_SLOW_MS > 0:
+        profiler = SamplingProfiler(PROFILE_SLOW_MS / 1000, PROFILE_INTERVAL, PROFILE_OUTPUT)
+        profiler.start()
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        g.profiled = profiler is not None and random.random() < PROFILE_SAMPLE_RATE
+        if g.profiled:
+            profiler.begin(threading.get_ident())
+
+    @app.teardown_request
+    def record_request(exc):
+        start = g.pop('request_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        route = _current_route()
+        status = g.pop('response_status', 500 if exc else 200)
+
+        REQUEST_LATENCY.observe((route, request.method), duration)
+        REQUESTS.inc((route, request.method, str(status)))
+
+        if g.pop('profiled', False):
+            profiler.end(threading.get_ident(), f'{request.method} {route}', duration)
+
+    @app.after_request
+    def remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
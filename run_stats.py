@@ -0,0 +1,183 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def peak_rss():
+    """Peak resident memory of this process in bytes, or None if unavailable"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KB
+
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t), ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+class RunStats:
+    """Thread-safe timing, queue and byte counters for one pipeline run"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now()
+        self.start_time = time.perf_counter()
+        self.lock = threading.Lock()
+        self.samples = {}       # stage -> list of durations (seconds)
+        self.active = {}        # stage -> currently running
+        self.max_active = {}    # stage -> peak concurrency
+        self.queues = {}        # queue -> current depth
+        self.max_queues = {}    # queue -> peak depth
+        self.counters = {}      # retries, failures, ...
+        self.bytes = {'in': 0, 'out': 0}
+        self.server = None
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage and track how many run concurrently"""
+        with self.lock:
+            self.active[name] = self.active.get(name, 0) + 1
+            self.max_active[name] = max(self.max_active.get(name, 0), self.active[name])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.active[name] -= 1
+                self.samples.setdefault(name, []).append(elapsed)
+
+    def record(self, name, seconds):
+        """Record a duration measured elsewhere"""
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def adjust_queue(self, name, delta):
+        with self.lock:
+            depth = self.queues.get(name, 0) + delta
+            self.queues[name] = depth
+            self.max_queues[name] = max(self.max_queues.get(name, 0), depth)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_bytes(self, direction, amount):
+        """Count bytes read from disk ('in') or sent upstream ('out')"""
+        with self.lock:
+            self.bytes[direction] = self.bytes.get(direction, 0) + amount
+
+    def snapshot(self):
+        """Current state as a JSON-serializable dict"""
+        with self.lock:
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+            active = dict(self.active)
+            max_active = dict(self.max_active)
+            queues = {name: {'depth': depth, 'maxDepth': self.max_queues[name]}
+                      for name, depth in self.queues.items()}
+            counters = dict(self.counters)
+            byte_counts = dict(self.bytes)
+
+        stages = {}
+        for name in set(samples) | set(active):
+            values = samples.get(name, [])
+            histogram = {}
+            for bound in STAGE_BUCKETS:
+                histogram[f'le_{bound}'] = sum(1 for v in values if v <= bound)
+            histogram['le_inf'] = len(values)
+
+            total = sum(values)
+            stages[name] = {
+                'count': len(values),
+                'totalSeconds': round(total, 4),
+                'meanSeconds': round(total / len(values), 4) if values else 0.0,
+                'p50Seconds': round(percentile(values, 0.50), 4),
+                'p95Seconds': round(percentile(values, 0.95), 4),
+                'maxSeconds': round(values[-1], 4) if values else 0.0,
+                'active': active.get(name, 0),
+                'maxActive': max_active.get(name, 0),
+                'histogram': histogram
+            }
+
+        return {
+            'run': self.name,
+            'startedAt': self.started_at.isoformat(timespec='seconds'),
+            'elapsedSeconds': round(time.perf_counter() - self.start_time, 3),
+            'stages': stages,
+            'queues': queues,
+            'counters': counters,
+            'bytes': byte_counts,
+            'peakRssBytes': peak_rss()
+        }
+
+    def write_report(self, report_dir, extra=None):
+        """Write the run report as JSON and return its path"""
+        os.makedirs(report_dir, exist_ok=True)
+        report = self.snapshot()
+        if extra:
+            report.update(extra)
+        file_name = f"{self.name}_{self.started_at.strftime('%Y%m%d_%H%M%S')}.json"
+        path = os.path.join(report_dir, file_name)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return path
+
+    def serve(self, port, host='127.0.0.1'):
+        """Expose the live snapshot as JSON on http://host:port/ in a background thread"""
+        stats = self
+
+        class StatsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(stats.snapshot(), indent=2).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep the upload progress output readable
+
+        self.server = ThreadingHTTPServer((host, port), StatsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server = None
@@ -3,6 +3,24 @@ const API_BASE_URL = '/api';
 let allPhotos = [];
 let currentPhotos = [];
 let currentPhotoIndex = 0;
+let collapseBursts = false;
+
+// Modal prefetch settings
+const PREFETCH_AHEAD = 2;
+const PREFETCH_BEHIND = 1;
+const DECODED_CACHE_SIZE = 8;
+
+const decodedImages = new Map();     // url -> decoded Image, oldest first (LRU)
+const pendingPrefetches = new Map(); // url -> Image still loading
+let prefetchToken = 0;
+
+// Virtualized gallery settings
+const OVERSCAN_ROWS = 2;
+
+const renderedItems = new Map(); // photo index -> gallery item node
+const itemPool = [];             // detached nodes ready for reuse
+let galleryLayout = null;
+let renderScheduled = false;
 
 // Elements
 const galleryGrid = document.getElementById('galleryGrid');
@@ -13,6 +31,8 @@ const modalClose = document.querySelector('.modal-close');
 const downloadBtn = document.getElementById('downloadBtn');
 const modalPrev = document.getElementById('modalPrev');
 const modalNext = document.getElementById('modalNext');
+const downloadAllBtn = document.getElementById('downloadAllBtn');
+const collapseBurstsBtn = document.getElementById('collapseBurstsBtn');
 
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
@@ -33,6 +53,17 @@ function setupEventListeners() {
     downloadBtn.addEventListener('click', downloadCurrentImage);
     modalPrev.addEventListener('click', showPreviousImage);
     modalNext.addEventListener('click', showNextImage);
+    downloadAllBtn.addEventListener('click', downloadAllPhotos);
+    collapseBurstsBtn.addEventListener('click', toggleCollapseBursts);
+
+    // One delegated handler for every gallery item
+    galleryGrid.addEventListener('click', handleGalleryClick);
+
+    window.addEventListener('scroll', scheduleGalleryRender, { passive: true });
+    window.addEventListener('resize', () => {
+        galleryLayout = null;
+        scheduleGalleryRender();
+    });
 
     // Keyboard navigation
     document.addEventListener('keydown', (e) => {
@@ -45,8 +76,19 @@ function setupEventListeners() {
 }
 
 async function loadAllPhotos() {
+    // Stream the listing so the first photos show while the rest is fetched
+    if (!collapseBursts && window.ReadableStream && window.TextDecoder) {
+        try {
+            await streamAllPhotos();
+            return;
+        } catch (error) {
+            console.warn('Photo stream failed, loading the full listing instead:', error);
+        }
+    }
+
     try {
-        const response = await fetch(`${API_BASE_URL}/photos`);
+        const query = collapseBursts ? '?collapse=1' : '';
+        const response = await fetch(`${API_BASE_URL}/photos${query}`);
         const data = await response.json();
         
         if (data.success) {
@@ -63,8 +105,90 @@ async function loadAllPhotos() {
     }
 }
 
+// GET /api/photos/stream: one photo per NDJSON line, then {"done": true}
+async function streamAllPhotos() {
+    const response = await fetch(`${API_BASE_URL}/photos/stream`);
+    if (!response.ok || !response.body) {
+        throw new Error(`Stream unavailable (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const photos = [];
+    let buffered = '';
+    let finished = false;
+
+    while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+
+        const shownBefore = photos.length;
+        for (const line of lines) {
+            if (!line) continue;
+            const message = JSON.parse(line);
+            if (message.error) {
+                throw new Error(message.error);
+            }
+            if (message.done) {
+                finished = true;
+                break;
+            }
+            photos.push(message);
+        }
+
+        if (photos.length > shownBefore) {
+            allPhotos = photos;
+            if (shownBefore === 0) {
+                displayGallery(photos);
+            } else {
+                scheduleGalleryRender(); // Same array - the grid just grows
+            }
+            photoCount.textContent = `${photos.length} photos…`;
+        }
+    }
+
+    if (!finished) {
+        throw new Error('Photo stream ended early');
+    }
+
+    // Photos arrive in partition order; settle into capture order at the end.
+    // Sort a copy: an open modal indexes into the array it was opened with.
+    let ordered = photos;
+    if (photos.some(photo => photo.order !== undefined)) {
+        ordered = [...photos].sort((a, b) => (a.order ?? Infinity) - (b.order ?? Infinity));
+    }
+    const viewing = imageModal.style.display === 'block' && currentPhotos === photos
+        ? photos[currentPhotoIndex]
+        : null;
+
+    allPhotos = ordered;
+    displayGallery(ordered);
+    photoCount.textContent = `${ordered.length} photos`;
+
+    // Keep the modal on the same photo, now at its capture-order position
+    if (viewing) {
+        currentPhotoIndex = ordered.findIndex(photo => photo.publicId === viewing.publicId);
+        updateModalNavigation();
+    }
+}
+
+function toggleCollapseBursts() {
+    collapseBursts = !collapseBursts;
+    collapseBurstsBtn.textContent = collapseBursts ? 'Show all frames' : 'Collapse bursts';
+    loadAllPhotos();
+}
+
 function displayGallery(photos) {
     galleryGrid.innerHTML = '';
+    galleryGrid.classList.remove('virtual');
+    galleryGrid.style.height = '';
+    renderedItems.clear();
+    galleryLayout = null;
     currentPhotos = photos;
     
     if (photos.length === 0) {
@@ -72,20 +196,85 @@ function displayGallery(photos) {
         return;
     }
     
-    photos.forEach((photo, index) => {
-        const item = createGalleryItem(photo, index, photos);
-        galleryGrid.appendChild(item);
+    galleryGrid.classList.add('virtual');
+    renderGalleryWindow();
+}
+
+// Column count and tile size, derived from the same CSS variables the grid uses
+function measureGalleryLayout() {
+    const style = getComputedStyle(galleryGrid);
+    const minItem = parseFloat(style.getPropertyValue('--gallery-min-item')) || 250;
+    const gap = parseFloat(style.getPropertyValue('--gallery-gap')) || 20;
+    const width = galleryGrid.clientWidth;
+
+    const columns = Math.max(1, Math.floor((width + gap) / (minItem + gap)));
+    const itemSize = (width - gap * (columns - 1)) / columns;
+
+    return { columns, gap, itemSize, rowHeight: itemSize + gap };
+}
+
+function scheduleGalleryRender() {
+    if (renderScheduled || !galleryGrid.classList.contains('virtual')) {
+        return;
+    }
+    renderScheduled = true;
+    requestAnimationFrame(() => {
+        renderScheduled = false;
+        renderGalleryWindow();
     });
 }
 
-function createGalleryItem(photo, index, photoArray) {
+// Only materialize the rows near the viewport, recycling nodes that scroll out
+function renderGalleryWindow() {
+    const photos = currentPhotos;
+    if (!galleryLayout) {
+        galleryLayout = measureGalleryLayout();
+    }
+    const { columns, gap, itemSize, rowHeight } = galleryLayout;
+
+    const totalRows = Math.ceil(photos.length / columns);
+    galleryGrid.style.height = `${Math.max(0, totalRows * rowHeight - gap)}px`;
+
+    const gridTop = galleryGrid.getBoundingClientRect().top;
+    const firstRow = Math.max(0, Math.floor(-gridTop / rowHeight) - OVERSCAN_ROWS);
+    const lastRow = Math.min(totalRows - 1,
+        Math.ceil((window.innerHeight - gridTop) / rowHeight) + OVERSCAN_ROWS);
+
+    const firstIndex = firstRow * columns;
+    const lastIndex = Math.min(photos.length - 1, (lastRow + 1) * columns - 1);
+
+    // Release nodes that left the window
+    renderedItems.forEach((item, index) => {
+        if (index < firstIndex || index > lastIndex || item.photo !== photos[index]) {
+            item.remove();
+            renderedItems.delete(index);
+            itemPool.push(item);
+        }
+    });
+
+    for (let index = firstIndex; index <= lastIndex; index++) {
+        let item = renderedItems.get(index);
+        if (!item) {
+            item = itemPool.pop() || createGalleryItem();
+            bindGalleryItem(item, photos[index], index);
+            renderedItems.set(index, item);
+            galleryGrid.appendChild(item);
+        }
+
+        const row = Math.floor(index / columns);
+        const column = index % columns;
+        item.style.width = `${itemSize}px`;
+        item.style.height = `${itemSize}px`;
+        item.style.top = `${row * rowHeight}px`;
+        item.style.left = `${column * (itemSize + gap)}px`;
+    }
+}
+
+function createGalleryItem() {
     const item = document.createElement('div');
     item.className = 'gallery-item';
-    item.style.animationDelay = `${index * 0.05}s`;
     
     const img = document.createElement('img');
-    img.src = photo.url;
-    img.alt = `Wedding photo ${index + 1}`;
     img.loading = 'lazy';
     
     // Download overlay
@@ -103,47 +292,163 @@ function createGalleryItem(photo, index, photoArray) {
         </svg>
     `;
     
-    downloadBtnSmall.addEventListener('click', (e) => {
-        e.stopPropagation();
-        downloadImage(photo.fullUrl || photo.url, `wedding-photo-${index + 1}.jpg`);
-    });
-    
     downloadOverlay.appendChild(downloadBtnSmall);
     item.appendChild(img);
     item.appendChild(downloadOverlay);
     
-    item.addEventListener('click', () => {
-        openModal(index, photoArray);
-    });
-    
     return item;
 }
 
+function bindGalleryItem(item, photo, index) {
+    const img = item.firstChild;
+    item.photo = photo;
+    item.dataset.index = index;
+    img.src = photo.url;
+    img.alt = `Wedding photo ${index + 1}`;
+
+    // Pooled nodes are rebound, so clear the badge as well as set it
+    if (photo.burstSize > 1) {
+        item.dataset.burst = `×${photo.burstSize}`;
+    } else {
+        delete item.dataset.burst;
+    }
+}
+
+function handleGalleryClick(e) {
+    const item = e.target.closest('.gallery-item');
+    if (!item || !galleryGrid.contains(item)) {
+        return;
+    }
+
+    const index = Number(item.dataset.index);
+    const photo = currentPhotos[index];
+
+    if (e.target.closest('.download-btn-small')) {
+        e.stopPropagation();
+        downloadImage(photo.fullUrl || photo.url, `wedding-photo-${index + 1}.jpg`);
+    } else {
+        openModal(index, currentPhotos);
+    }
+}
+
 function openModal(index, photoArray) {
     currentPhotoIndex = index;
     currentPhotos = photoArray;
-    modalImage.src = photoArray[index].fullUrl || photoArray[index].url;
     imageModal.style.display = 'block';
-    updateModalNavigation();
+    showModalImage();
 }
 
 function closeModal() {
     imageModal.style.display = 'none';
+    cancelStalePrefetches(new Set());
 }
 
 function showPreviousImage() {
     if (currentPhotoIndex > 0) {
         currentPhotoIndex--;
-        modalImage.src = currentPhotos[currentPhotoIndex].fullUrl || currentPhotos[currentPhotoIndex].url;
-        updateModalNavigation();
+        showModalImage();
     }
 }
 
 function showNextImage() {
     if (currentPhotoIndex < currentPhotos.length - 1) {
         currentPhotoIndex++;
-        modalImage.src = currentPhotos[currentPhotoIndex].fullUrl || currentPhotos[currentPhotoIndex].url;
-        updateModalNavigation();
+        showModalImage();
+    }
+}
+
+function showModalImage() {
+    const url = getModalUrl(currentPhotos[currentPhotoIndex]);
+    const cached = decodedImages.get(url);
+    if (cached) {
+        // Touch the entry so it stays in the LRU
+        rememberDecoded(url, cached);
+    }
+    modalImage.src = url;
+    updateModalNavigation();
+    schedulePrefetch();
+}
+
+// Screen-sized rendition for the modal; full resolution is only used for downloads
+function getModalUrl(photo) {
+    return photo.previewUrl || photo.fullUrl || photo.url;
+}
+
+// Prefetch the neighbours of the current photo once it has loaded
+function schedulePrefetch() {
+    const token = ++prefetchToken;
+    const wanted = [];
+
+    // Nearest neighbours first, forward direction favoured
+    for (let offset = 1; offset <= Math.max(PREFETCH_AHEAD, PREFETCH_BEHIND); offset++) {
+        if (offset <= PREFETCH_AHEAD && currentPhotoIndex + offset < currentPhotos.length) {
+            wanted.push(getModalUrl(currentPhotos[currentPhotoIndex + offset]));
+        }
+        if (offset <= PREFETCH_BEHIND && currentPhotoIndex - offset >= 0) {
+            wanted.push(getModalUrl(currentPhotos[currentPhotoIndex - offset]));
+        }
+    }
+
+    // Drop prefetches for photos we have navigated away from
+    cancelStalePrefetches(new Set(wanted));
+
+    const start = () => {
+        if (token === prefetchToken) {
+            wanted.forEach(prefetchImage);
+        }
+    };
+
+    // Let the visible image have the connection to itself first
+    if (modalImage.complete) {
+        start();
+    } else {
+        modalImage.addEventListener('load', start, { once: true });
+        modalImage.addEventListener('error', start, { once: true });
+    }
+}
+
+function prefetchImage(url) {
+    if (decodedImages.has(url) || pendingPrefetches.has(url)) {
+        return;
+    }
+
+    const img = new Image();
+    img.decoding = 'async';
+    pendingPrefetches.set(url, img);
+    img.src = url;
+
+    img.decode()
+        .then(() => {
+            if (pendingPrefetches.get(url) === img) {
+                pendingPrefetches.delete(url);
+                rememberDecoded(url, img);
+            }
+        })
+        .catch(() => {
+            // Cancelled or failed - the modal will just load it normally
+            if (pendingPrefetches.get(url) === img) {
+                pendingPrefetches.delete(url);
+            }
+        });
+}
+
+function cancelStalePrefetches(wanted) {
+    pendingPrefetches.forEach((img, url) => {
+        if (!wanted.has(url)) {
+            // Clearing src aborts the in-flight request
+            img.src = '';
+            pendingPrefetches.delete(url);
+        }
+    });
+}
+
+function rememberDecoded(url, img) {
+    decodedImages.delete(url);
+    decodedImages.set(url, img);
+
+    while (decodedImages.size > DECODED_CACHE_SIZE) {
+        const oldest = decodedImages.keys().next().value;
+        decodedImages.delete(oldest);
     }
 }
 
@@ -177,6 +482,31 @@ function downloadImage(url, filename) {
         });
 }
 
+// Let the browser stream the ZIP straight to disk instead of buffering a Blob
+function downloadAllPhotos() {
+    const form = document.createElement('form');
+    form.method = 'POST';
+    form.action = `${API_BASE_URL}/download`;
+
+    const addField = (name, value) => {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = name;
+        input.value = value;
+        form.appendChild(input);
+    };
+
+    if (currentPhotos === allPhotos) {
+        addField('all', '1');
+    } else {
+        currentPhotos.forEach(photo => addField('publicIds', photo.publicId));
+    }
+
+    document.body.appendChild(form);
+    form.submit();
+    document.body.removeChild(form);
+}
+
 function showError(message) {
     alert(message);
 }
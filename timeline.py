@@ -0,0 +1,200 @@
+import bisect
+import io
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Capture-time index written by the upload scripts, one JSON object per line
+TIMELINE_FILE = os.getenv('TIMELINE_FILE', 'timeline.jsonl')
+EXIF_HEADER_BYTES = 128 * 1024  # EXIF lives in the first APP1 segment (max 64KB)
+UPLOAD_FOLDER = 'wedding_photos'
+
+# EXIF tags
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_ORIENTATION = 0x0112
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+
+timeline_lock = threading.Lock()
+
+
+def _parse_exif_time(value):
+    try:
+        return datetime.strptime(value.strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+    except (AttributeError, ValueError):
+        return None
+
+
+def read_metadata(image_path):
+    """Capture time, camera and orientation from the file header, without decoding pixels"""
+    from PIL import Image  # Only needed at ingest, keep it out of the web app's imports
+
+    image_path = Path(image_path)
+    with open(image_path, 'rb') as f:
+        header = f.read(EXIF_HEADER_BYTES)
+
+    try:
+        img = Image.open(io.BytesIO(header))
+        exif = img.getexif()
+        size = img.size
+    except Exception:
+        # Header too short or unusual layout - let Pillow read what it needs from the file
+        with Image.open(image_path) as img:
+            exif = img.getexif()
+            size = img.size
+
+    exif_ifd = exif.get_ifd(TAG_EXIF_IFD)
+    taken_at = _parse_exif_time(exif_ifd.get(TAG_DATETIME_ORIGINAL)) or _parse_exif_time(exif.get(TAG_DATETIME))
+    time_source = 'exif'
+    if taken_at is None:
+        taken_at = datetime.fromtimestamp(image_path.stat().st_mtime).replace(microsecond=0)
+        time_source = 'mtime'
+
+    make = str(exif.get(TAG_MAKE, '')).strip('\x00 ')
+    model = str(exif.get(TAG_MODEL, '')).strip('\x00 ')
+    if make and model.startswith(make):
+        make = ''  # Models often repeat the make ("Canon" / "Canon EOS R6")
+
+    return {
+        'takenAt': taken_at.isoformat(),
+        'timeSource': time_source,
+        'camera': ' '.join(part for part in (make, model) if part) or 'Unknown',
+        'orientation': int(exif.get(TAG_ORIENTATION, 1)),
+        'width': size[0],
+        'height': size[1]
+    }
+
+
+def record_photo(public_id, metadata, timeline_path=None, **extra):
+    """Append an uploaded photo to the timeline log"""
+    entry = dict(metadata, publicId=public_id, **extra)
+    with timeline_lock:
+        with open(timeline_path or TIMELINE_FILE, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+class Timeline:
+    """Photos sorted by capture time, for O(log n) range queries"""
+
+    def __init__(self, entries, mtime=None):
+        # Later lines win, so re-uploads replace earlier records
+        latest = {}
+        for entry in entries:
+            latest[entry['publicId']] = entry
+        self.entries = sorted(latest.values(), key=lambda e: (e['takenAt'], e['publicId']))
+        self.times = [e['takenAt'] for e in self.entries]
+        self.positions = {e['publicId']: i for i, e in enumerate(self.entries)}
+        self.mtime = mtime
+        self._bursts = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def range(self, start=None, end=None):
+        """Entries captured in [start, end), as ISO strings or datetimes"""
+        lo = bisect.bisect_left(self.times, _iso(start)) if start else 0
+        hi = bisect.bisect_left(self.times, _iso(end)) if end else len(self.times)
+        return self.entries[lo:hi]
+
+    def resolve(self, value, day=None):
+        """Turn 'HH:MM' into a datetime on ``day`` (default: the first day of the event)"""
+        if 'T' in value or len(value) > 8:
+            resolved = datetime.fromisoformat(value)
+        else:
+            if day is None:
+                if not self.times:
+                    return None
+                day = datetime.fromisoformat(self.times[0]).date().isoformat()
+            resolved = datetime.fromisoformat(f'{day}T{value}')
+        # EXIF capture times are the camera's local time with no zone to convert to
+        if resolved.tzinfo is not None:
+            raise ValueError(f"'{value}' has a time zone offset; use the camera's local time")
+        return resolved
+
+    def buckets(self, minutes=30):
+        """Photo counts per time bucket, for jumping to the ceremony or the reception"""
+        width = timedelta(minutes=minutes)
+        result = []
+        for entry in self.entries:
+            taken_at = datetime.fromisoformat(entry['takenAt'])
+            bucket_start = taken_at - (taken_at - datetime.min) % width
+            if result and result[-1]['start'] == bucket_start.isoformat():
+                result[-1]['count'] += 1
+            else:
+                result.append({'start': bucket_start.isoformat(), 'count': 1})
+        return result
+
+    def bursts(self):
+        """Capture-ordered groups of burst frames, computed once per timeline version"""
+        if self._bursts is None:
+            from dedup import group_bursts
+            self._bursts = group_bursts(self.entries)
+        return self._bursts
+
+    def sort_key(self, public_id):
+        """Position in capture order; photos missing from the timeline sort last"""
+        return self.positions.get(public_id, len(self.entries))
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+_timeline = None
+
+
+def load_timeline(path=None):
+    """Return the timeline, reloading it when the log grows; None if there is none"""
+    global _timeline
+    path = path or TIMELINE_FILE
+
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    if _timeline is None or _timeline.mtime != mtime:
+        with open(path, 'r') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        _timeline = Timeline(entries, mtime)
+    return _timeline
+
+
+def backfill(root_path, uploaded_files='uploaded_files.txt'):
+    """Build timeline entries for photos uploaded before the timeline existed"""
+    with open(uploaded_files, 'r') as f:
+        uploaded = set(line.strip() for line in f)
+    timeline = load_timeline()
+    known = set(timeline.positions) if timeline else set()
+
+    added = 0
+    for root, dirs, files in os.walk(root_path):
+        for file in files:
+            public_id = f'{UPLOAD_FOLDER}/{Path(file).stem}'
+            if file not in uploaded or public_id in known:
+                continue
+            path = Path(root) / file
+            try:
+                metadata = read_metadata(path)
+            except Exception as e:
+                print(f"  ✗ {path}: {str(e)}")
+                continue
+            record_photo(public_id, metadata, sourceFolder=path.parent.name)
+            known.add(public_id)
+            added += 1
+    return added
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python timeline.py <photos folder>")
+        sys.exit(1)
+
+    print(f"Reading capture times under {sys.argv[1]}...")
+    count = backfill(sys.argv[1])
+    print(f"✓ Added {count} photos to {TIMELINE_FILE}")
@@ -0,0 +1,304 @@
+import io
+import os
+import threading
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from chunked_upload import ResumableUploader
+from dedup import DuplicateIndex, dhash, thumbprint
+from encoding import get_profile, check_format, resize, encode_image
+from memory_budget import MemoryBudget, limit_malloc_arenas, draft_size, decode_footprint, reduce_decoded
+from run_stats import RunStats
+from timeline import read_metadata, record_photo
+
+# Compress → de-duplicate → upload → index, shared by the upload scripts and
+# watch_folder.py. Each script makes an UploadPipeline with its own settings
+# and calls process_single_image from its worker threads.
+
+UPLOAD_FOLDER = 'wedding_photos'
+TARGET_SIZE = (2400, 2400)  # Max dimensions
+UPLOADED_FILES = 'uploaded_files.txt'  # Track uploaded files
+MAX_RETRIES = 3
+RETRY_DELAY = 2  # seconds
+RUN_REPORT_DIR = 'run_reports'  # JSON run reports with per-stage timings
+SKIP_DUPLICATES = True  # Don't upload a photo that matches an uploaded one, at any size or quality
+ENCODE_PROFILE = 'balanced'  # fast, balanced or smallest (see encoding.py)
+ENCODE_FORMAT = 'JPEG'  # JPEG, WEBP or AVIF
+MEMORY_BUDGET_MB = 1024  # Decoded pixels held at once across all workers
+UPLOAD_MODE = 'auto'  # auto (by size and link speed), single or chunked
+UPLOAD_SESSIONS_FILE = 'upload_sessions.json'  # Unfinished chunked uploads, resumed on re-run
+
+# Image extensions to look for
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG'}
+
+uploaded_lock = threading.Lock()
+
+
+def load_uploaded_files(path=UPLOADED_FILES):
+    """Load list of already uploaded files"""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return set(line.strip() for line in f)
+    return set()
+
+
+def mark_as_uploaded(file_name, path=UPLOADED_FILES):
+    """Mark a file as uploaded"""
+    with uploaded_lock:
+        with open(path, 'a') as f:
+            f.write(f"{file_name}\n")
+
+
+def find_all_images(root_path):
+    """Recursively find all image files in the directory tree"""
+    print(f"Scanning {root_path} for images...")
+    image_files = []
+
+    # Walk through all directories recursively
+    for root, dirs, files in os.walk(root_path):
+        for file in files:
+            if Path(file).suffix in IMAGE_EXTENSIONS:
+                full_path = Path(root) / file
+                image_files.append(full_path)
+
+    return image_files
+
+
+def detect_faces(img):
+    """Detect faces in a decoded PIL image and extract embeddings using DeepFace"""
+    # TensorFlow and numpy - only the face detection scripts pay for them
+    import numpy as np
+    from deepface import DeepFace
+
+    try:
+        # DeepFace takes BGR arrays, as cv2 would have decoded the file
+        pixels = np.asarray(img.convert('RGB'))[:, :, ::-1]
+
+        # Use Facenet model (more accurate than VGG-Face)
+        embeddings = DeepFace.represent(
+            img_path=pixels,
+            model_name='Facenet',
+            enforce_detection=False  # Don't fail if no face found
+        )
+
+        if embeddings and len(embeddings) > 0:
+            # Extract just the embedding vectors
+            face_embeddings = [emb['embedding'] for emb in embeddings]
+            return {'success': True, 'count': len(face_embeddings), 'embeddings': face_embeddings}
+        else:
+            return {'success': False, 'count': 0, 'embeddings': []}
+    except Exception as e:
+        print(f"    Face detection error: {str(e)}")
+        return {'success': False, 'count': 0, 'embeddings': []}
+
+
+class UploadPipeline:
+    """Settings, stats and shared state for one upload run"""
+
+    def __init__(self, name, profile=ENCODE_PROFILE, fmt=ENCODE_FORMAT, memory_budget_mb=MEMORY_BUDGET_MB,
+                 upload_mode=UPLOAD_MODE, skip_duplicates=SKIP_DUPLICATES, faces=False, show_paths=False,
+                 uploaded_files=UPLOADED_FILES, sessions_file=UPLOAD_SESSIONS_FILE):
+        self.profile = profile
+        self.format = fmt
+        self.skip_duplicates = skip_duplicates
+        self.faces = faces  # Detect faces before uploading
+        self.show_paths = show_paths  # Print where each photo came from (nested USB folders)
+        self.uploaded_files = uploaded_files
+        self.retry_delay = RETRY_DELAY
+
+        # Per-stage timings, queue depths and byte counts for this run
+        self.stats = RunStats(name)
+
+        # Limits concurrent decodes by their size rather than by worker count
+        self.memory_budget = MemoryBudget(memory_budget_mb * 1024 * 1024)
+
+        # Sends each photo in one request or in resumable chunks
+        self.uploader = ResumableUploader(sessions_file, mode=upload_mode, stats=self.stats)
+
+        # Perceptual hashes of uploaded photos, seeded from the timeline by start()
+        self.duplicate_index = DuplicateIndex()
+
+    def start(self, stats_port=None):
+        """Check the settings and prepare shared state before the workers start"""
+        # Fail before the run rather than on every image
+        get_profile(self.profile)
+        check_format(self.format)
+
+        if stats_port:
+            self.stats.serve(stats_port)
+            print(f"Live stats: http://127.0.0.1:{stats_port}/")
+
+        # Keep freed pixel memory reusable across workers
+        limit_malloc_arenas()
+
+        # Photos uploaded by earlier runs count as duplicates too
+        self.duplicate_index = DuplicateIndex.from_timeline()
+
+    def load_uploaded_files(self):
+        return load_uploaded_files(self.uploaded_files)
+
+    def compress_image(self, image_path):
+        """Compress image to reduce file size; also returns its perceptual hash, thumbprint and, with faces on, its faces"""
+        stats = self.stats
+        profile = get_profile(self.profile)
+
+        with stats.stage('read'):
+            with open(image_path, 'rb') as f:
+                raw = f.read()
+        stats.add_bytes('in', len(raw))
+
+        # Only the header is parsed here; pixels are decoded under the memory budget
+        img = Image.open(io.BytesIO(raw))
+
+        # Let JPEGs decode at a reduced scale, as thumbnail() would. The request
+        # keeps the aspect ratio so panoramas get the 1/4 or 1/8 decode too.
+        size = draft_size(img.size, TARGET_SIZE)
+        if size:
+            img.draft(None, size)
+        footprint = decode_footprint(img, len(raw))
+        if self.faces:
+            # The BGR copy handed to DeepFace, at most the resized size
+            footprint += TARGET_SIZE[0] * TARGET_SIZE[1] * 3
+
+        with stats.stage('memory_wait'):
+            self.memory_budget.acquire(footprint)
+        try:
+            with stats.stage('decode'):
+                img.load()
+                img = reduce_decoded(img, TARGET_SIZE)
+
+                # Convert to RGB if necessary
+                if img.mode in ('RGBA', 'LA', 'P'):
+                    img = img.convert('RGB')
+
+            with stats.stage('resize'):
+                # Resize if too large, and rotate to the EXIF orientation
+                img = resize(img, TARGET_SIZE, profile)
+
+            with stats.stage('phash'):
+                # Perceptual hash from the pixels we already decoded, and a thumbprint to confirm a match
+                phash = dhash(img)
+                thumb = thumbprint(img)
+
+            with stats.stage('encode'):
+                # Save to bytes buffer, dropping EXIF/GPS metadata
+                buffer = encode_image(img, profile, self.format)
+
+            face_result = None
+            if self.faces:
+                # On the upright, resized pixels, never the full-size original
+                with stats.stage('faces'):
+                    face_result = detect_faces(img)
+        finally:
+            self.memory_budget.release(footprint)
+
+        return buffer, phash, thumb, face_result
+
+    def process_single_image(self, image_file, index, total):
+        """Process a single image - compress, detect faces if enabled, and upload"""
+        stats = self.stats
+        file_name = image_file.name
+        public_id = f'{UPLOAD_FOLDER}/{Path(file_name).stem}'
+        stats.adjust_queue('pending', -1)
+
+        for attempt in range(MAX_RETRIES):
+            try:
+                print(f"[{index}/{total}] Processing: {file_name}")
+                if self.show_paths:
+                    print(f"  ↳ Path: {image_file}")
+
+                # Get original file size
+                original_size = image_file.stat().st_size / (1024 * 1024)  # MB
+
+                # Compress image
+                compressed_buffer, phash, thumb, face_result = self.compress_image(str(image_file))
+                compressed_size = compressed_buffer.getbuffer().nbytes / (1024 * 1024)
+                print(f"  ↳ Compressed: {original_size:.2f}MB → {compressed_size:.2f}MB")
+
+                # Skip photos that match one already uploaded, even at another size or quality
+                duplicate_of = self.duplicate_index.claim(phash, thumb, public_id) if self.skip_duplicates else None
+                if duplicate_of:
+                    stats.count('duplicates')
+                    print(f"  ↷ Skipped: same photo as {duplicate_of}")
+                    mark_as_uploaded(file_name, self.uploaded_files)
+                    return {'success': True, 'has_faces': False, 'file_name': file_name,
+                            'public_id': public_id, 'duplicate_of': duplicate_of}
+
+                # Capture time, camera and orientation from the EXIF header
+                with stats.stage('metadata'):
+                    metadata = read_metadata(image_file)
+
+                # Faces were detected BEFORE uploading, while compressing
+                if face_result and face_result['success'] and face_result['count'] > 0:
+                    print(f"  ↳ ✓ {face_result['count']} face(s) detected")
+                elif self.faces:
+                    print(f"  ↳ No faces detected")
+
+                # Upload to Cloudinary with retry (chunked uploads resume where they stopped)
+                with stats.stage('upload'):
+                    self.uploader.upload(
+                        compressed_buffer,
+                        folder=UPLOAD_FOLDER,
+                        public_id=Path(file_name).stem,
+                        resource_type='image',
+                        quality='auto:good',
+                        timeout=60
+                    )
+                stats.add_bytes('out', compressed_buffer.getbuffer().nbytes)
+
+                print(f"  ✓ Uploaded: {file_name}")
+                mark_as_uploaded(file_name, self.uploaded_files)
+                record_photo(public_id, metadata,
+                             sourceFolder=image_file.parent.name,
+                             bytes=compressed_buffer.getbuffer().nbytes,
+                             phash=f'{phash:016x}',
+                             thumbprint=thumb)
+                # Workers holding a duplicate of this photo can skip it now
+                self.duplicate_index.confirm(public_id)
+
+                # Return face data if faces were found
+                if face_result and face_result['success'] and face_result['count'] > 0:
+                    return {
+                        'success': True,
+                        'has_faces': True,
+                        'file_name': file_name,
+                        'public_id': public_id,
+                        'data': {
+                            'fileName': file_name,
+                            'publicId': Path(file_name).stem,
+                            'faceCount': face_result['count'],
+                            'embeddings': face_result['embeddings']
+                        }
+                    }
+                return {'success': True, 'has_faces': False, 'file_name': file_name, 'public_id': public_id}
+
+            except Exception as e:
+                if attempt < MAX_RETRIES - 1:
+                    stats.count('retries')
+                    print(f"  ⚠ Retry {attempt + 1}/{MAX_RETRIES}: {file_name}")
+                    time.sleep(self.retry_delay)
+                else:
+                    stats.count('failed')
+                    self.duplicate_index.release(public_id)
+                    print(f"  ✗ Failed after {MAX_RETRIES} attempts: {file_name} - {str(e)}")
+                    return {'success': False, 'error': str(e), 'file_name': file_name, 'public_id': public_id}
+
+    def finish(self, report_dir=RUN_REPORT_DIR, **extra):
+        """Write the run report, stop the stats server and print the shared summary lines"""
+        report_path = self.stats.write_report(report_dir, extra={
+            'memoryBudgetBytes': self.memory_budget.limit,
+            'uploadThroughput': round(self.uploader.throughput.get(default=0)),
+            'peakReservedBytes': self.memory_budget.peak,
+            **extra
+        })
+        self.stats.stop()
+        return report_path
+
+    def print_summary(self, report_path):
+        print(f"↷ Skipped duplicates: {self.stats.counters.get('duplicates', 0)}")
+        peak = self.stats.snapshot()['peakRssBytes']
+        if peak:
+            print(f"🧠 Peak memory: {peak / (1024 * 1024):.0f}MB")
+        print(f"📝 Run report: {report_path}")
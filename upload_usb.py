@@ -2,14 +2,10 @@ import cloudinary
 import cloudinary.uploader
 from dotenv import load_dotenv
 import os
-from pathlib import Path
-from PIL import Image
-import io
 import json
-from deepface import DeepFace
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-import time
+from upload_pipeline import UploadPipeline, load_uploaded_files, find_all_images
 
 # Load environment variables
 load_dotenv()
@@ -21,157 +17,17 @@ cloudinary.config(
     api_secret=os.getenv('CLOUDINARY_API_SECRET')
 )
 
-# Configuration
+# Configuration (encoding, retries, memory budget and the rest are set in upload_pipeline.py)
 USB_DRIVE = 'D:\\'  # USB drive path
-UPLOAD_FOLDER = 'wedding_photos'
-TARGET_SIZE = (2400, 2400)  # Max dimensions
 FACES_DB_FILE = 'faces_db.json'
-UPLOADED_FILES = 'uploaded_files.txt'  # Track uploaded files
 MAX_WORKERS = 3  # Parallel workers
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
-
-# Image extensions to look for
-IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG'}
+STATS_PORT = None  # e.g. 8765 to serve live stats while uploading
 
 # Thread-safe data structures
 faces_lock = threading.Lock()
-uploaded_lock = threading.Lock()
-
-
-def compress_image(image_path, quality=85):
-    """Compress image to reduce file size"""
-    img = Image.open(image_path)
-
-    # Convert to RGB if necessary
-    if img.mode in ('RGBA', 'LA', 'P'):
-        img = img.convert('RGB')
-
-    # Resize if too large
-    img.thumbnail(TARGET_SIZE, Image.Resampling.LANCZOS)
-
-    # Save to bytes buffer
-    buffer = io.BytesIO()
-    img.save(buffer, format='JPEG', quality=quality, optimize=True)
-    buffer.seek(0)
-
-    return buffer
-
-
-def detect_faces(image_path):
-    """Detect faces and extract embeddings using DeepFace"""
-    try:
-        # Use Facenet model (more accurate than VGG-Face)
-        embeddings = DeepFace.represent(
-            img_path=str(image_path),
-            model_name='Facenet',
-            enforce_detection=False  # Don't fail if no face found
-        )
-
-        if embeddings and len(embeddings) > 0:
-            # Extract just the embedding vectors
-            face_embeddings = [emb['embedding'] for emb in embeddings]
-            return {'success': True, 'count': len(face_embeddings), 'embeddings': face_embeddings}
-        else:
-            return {'success': False, 'count': 0, 'embeddings': []}
-    except Exception as e:
-        print(f"    Face detection error: {str(e)}")
-        return {'success': False, 'count': 0, 'embeddings': []}
-
-
-def load_uploaded_files():
-    """Load list of already uploaded files"""
-    if os.path.exists(UPLOADED_FILES):
-        with open(UPLOADED_FILES, 'r') as f:
-            return set(line.strip() for line in f)
-    return set()
-
-
-def mark_as_uploaded(file_name):
-    """Mark a file as uploaded"""
-    with uploaded_lock:
-        with open(UPLOADED_FILES, 'a') as f:
-            f.write(f"{file_name}\n")
-
 
-def find_all_images(root_path):
-    """Recursively find all image files in the directory tree"""
-    print(f"Scanning {root_path} for images...")
-    image_files = []
-    
-    # Walk through all directories recursively
-    for root, dirs, files in os.walk(root_path):
-        for file in files:
-            if Path(file).suffix in IMAGE_EXTENSIONS:
-                full_path = Path(root) / file
-                image_files.append(full_path)
-    
-    return image_files
-
-
-def process_single_image(image_file, index, total):
-    """Process a single image - compress, detect faces, and upload"""
-    file_name = image_file.name
-
-    for attempt in range(MAX_RETRIES):
-        try:
-            print(f"[{index}/{total}] Processing: {file_name}")
-            print(f"  ↳ Path: {image_file}")
-
-            # Get original file size
-            original_size = image_file.stat().st_size / (1024 * 1024)  # MB
-
-            # Compress image
-            compressed_buffer = compress_image(str(image_file))
-            compressed_size = compressed_buffer.getbuffer().nbytes / (1024 * 1024)
-            print(
-                f"  ↳ Compressed: {original_size:.2f}MB → {compressed_size:.2f}MB")
-
-            # Detect faces BEFORE uploading
-            face_result = detect_faces(str(image_file))
-
-            if face_result['success'] and face_result['count'] > 0:
-                print(f"  ↳ ✓ {face_result['count']} face(s) detected")
-            else:
-                print(f"  ↳ No faces detected")
-
-            # Upload to Cloudinary with retry
-            result = cloudinary.uploader.upload(
-                compressed_buffer,
-                folder=UPLOAD_FOLDER,
-                public_id=Path(file_name).stem,
-                resource_type='image',
-                quality='auto:good',
-                timeout=60
-            )
-
-            print(f"  ✓ Uploaded: {file_name}")
-            mark_as_uploaded(file_name)
-
-            # Return face data if faces were found
-            if face_result['success'] and face_result['count'] > 0:
-                return {
-                    'success': True,
-                    'has_faces': True,
-                    'file_name': file_name,
-                    'data': {
-                        'fileName': file_name,
-                        'publicId': Path(file_name).stem,
-                        'faceCount': face_result['count'],
-                        'embeddings': face_result['embeddings']
-                    }
-                }
-            else:
-                return {'success': True, 'has_faces': False, 'file_name': file_name}
-
-        except Exception as e:
-            if attempt < MAX_RETRIES - 1:
-                print(f"  ⚠ Retry {attempt + 1}/{MAX_RETRIES}: {file_name}")
-                time.sleep(RETRY_DELAY)
-            else:
-                print(
-                    f"  ✗ Failed after {MAX_RETRIES} attempts: {file_name} - {str(e)}")
-                return {'success': False, 'error': str(e), 'file_name': file_name}
+# Compress, de-duplicate, detect faces and upload
+pipeline = UploadPipeline('upload_usb', faces=True, show_paths=True)
 
 
 def upload_images_from_usb():
@@ -228,15 +84,21 @@ def upload_images_from_usb():
         print(f"  ... and {len(unique_dirs) - 5} more folders")
     print()
 
+    pipeline.start(STATS_PORT)
+    print(f"Encoding: {pipeline.profile} profile, {pipeline.format}")
+    print()
+
     success_count = 0
     error_count = 0
     faces_detected = 0
 
+    pipeline.stats.adjust_queue('pending', len(remaining_files))
+
     # Process images in parallel
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         # Submit all tasks
         future_to_file = {
-            executor.submit(process_single_image, img, i + 1, len(remaining_files)): img
+            executor.submit(pipeline.process_single_image, img, i + 1, len(remaining_files)): img
             for i, img in enumerate(remaining_files)
         }
 
@@ -263,12 +125,15 @@ def upload_images_from_usb():
     with open(FACES_DB_FILE, 'w') as f:
         json.dump(faces_database, f, indent=2)
 
+    report_path = pipeline.finish(workers=MAX_WORKERS, succeeded=success_count, failed=error_count)
+
     print()
     print("=" * 70)
     print("Upload Complete!")
     print("=" * 70)
     print(f"✓ Successfully uploaded (this session): {success_count}")
     print(f"✗ Failed: {error_count}")
+    pipeline.print_summary(report_path)
     print(f"👤 Photos with faces (this session): {faces_detected}")
     print(
         f"📊 Total uploaded: {len(uploaded_files) + success_count}/{len(image_files)}")
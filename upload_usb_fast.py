@@ -2,14 +2,12 @@ import cloudinary
 import cloudinary.uploader
 from dotenv import load_dotenv
 import os
-from pathlib import Path
-from PIL import Image
-import io
-import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
 import time
 import argparse
+from encoding import PROFILES, FORMATS
+import upload_pipeline
+from upload_pipeline import UploadPipeline, load_uploaded_files, find_all_images
 
 # Load environment variables
 load_dotenv()
@@ -21,110 +19,13 @@ cloudinary.config(
     api_secret=os.getenv('CLOUDINARY_API_SECRET')
 )
 
-# Configuration
+# Configuration (encoding, retries, memory budget and the rest are set in upload_pipeline.py)
 USB_DRIVE = 'D:\\'  # USB drive path
-UPLOAD_FOLDER = 'wedding_photos'
-TARGET_SIZE = (2400, 2400)  # Max dimensions
-UPLOADED_FILES = 'uploaded_files.txt'  # Track uploaded files
 MAX_WORKERS = 5  # Increased for faster uploads
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+STATS_PORT = None  # e.g. 8765 to serve live stats while uploading
 
-# Image extensions to look for
-IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG'}
-
-# Thread-safe data structures
-uploaded_lock = threading.Lock()
-stats_lock = threading.Lock()
-
-
-def compress_image(image_path, quality=85):
-    """Compress image to reduce file size"""
-    img = Image.open(image_path)
-
-    # Convert to RGB if necessary
-    if img.mode in ('RGBA', 'LA', 'P'):
-        img = img.convert('RGB')
-
-    # Resize if too large
-    img.thumbnail(TARGET_SIZE, Image.Resampling.LANCZOS)
-
-    # Save to bytes buffer
-    buffer = io.BytesIO()
-    img.save(buffer, format='JPEG', quality=quality, optimize=True)
-    buffer.seek(0)
-
-    return buffer
-
-
-def load_uploaded_files():
-    """Load list of already uploaded files"""
-    if os.path.exists(UPLOADED_FILES):
-        with open(UPLOADED_FILES, 'r') as f:
-            return set(line.strip() for line in f)
-    return set()
-
-
-def mark_as_uploaded(file_name):
-    """Mark a file as uploaded"""
-    with uploaded_lock:
-        with open(UPLOADED_FILES, 'a') as f:
-            f.write(f"{file_name}\n")
-
-
-def find_all_images(root_path):
-    """Recursively find all image files in the directory tree"""
-    print(f"Scanning {root_path} for images...")
-    image_files = []
-    
-    # Walk through all directories recursively
-    for root, dirs, files in os.walk(root_path):
-        for file in files:
-            if Path(file).suffix in IMAGE_EXTENSIONS:
-                full_path = Path(root) / file
-                image_files.append(full_path)
-    
-    return image_files
-
-
-def process_single_image(image_file, index, total):
-    """Process a single image - compress and upload (NO face detection)"""
-    file_name = image_file.name
-
-    for attempt in range(MAX_RETRIES):
-        try:
-            print(f"[{index}/{total}] Processing: {file_name}")
-
-            # Get original file size
-            original_size = image_file.stat().st_size / (1024 * 1024)  # MB
-
-            # Compress image
-            compressed_buffer = compress_image(str(image_file))
-            compressed_size = compressed_buffer.getbuffer().nbytes / (1024 * 1024)
-            print(f"  ↳ Compressed: {original_size:.2f}MB → {compressed_size:.2f}MB")
-
-            # Upload to Cloudinary with retry
-            result = cloudinary.uploader.upload(
-                compressed_buffer,
-                folder=UPLOAD_FOLDER,
-                public_id=Path(file_name).stem,
-                resource_type='image',
-                quality='auto:good',
-                timeout=60
-            )
-
-            print(f"  ✓ Uploaded: {file_name}")
-            mark_as_uploaded(file_name)
-
-            return {'success': True, 'file_name': file_name}
-
-        except Exception as e:
-            if attempt < MAX_RETRIES - 1:
-                print(f"  ⚠ Retry {attempt + 1}/{MAX_RETRIES}: {file_name}")
-                time.sleep(RETRY_DELAY)
-            else:
-                print(f"  ✗ Failed after {MAX_RETRIES} attempts: {file_name} - {str(e)}")
-                return {'success': False, 'error': str(e), 'file_name': file_name}
+# Compress, de-duplicate and upload (NO face detection)
+pipeline = UploadPipeline('upload_usb_fast')
 
 
 def upload_images_from_usb():
@@ -176,15 +77,21 @@ def upload_images_from_usb():
     print("      You can run face detection separately later if needed.")
     print()
 
+    pipeline.start(STATS_PORT)
+    print(f"Encoding: {pipeline.profile} profile, {pipeline.format}")
+    print()
+
     success_count = 0
     error_count = 0
     start_time = time.time()
 
+    pipeline.stats.adjust_queue('pending', len(remaining_files))
+
     # Process images in parallel
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         # Submit all tasks
         future_to_file = {
-            executor.submit(process_single_image, img, i + 1, len(remaining_files)): img
+            executor.submit(pipeline.process_single_image, img, i + 1, len(remaining_files)): img
             for i, img in enumerate(remaining_files)
         }
 
@@ -204,12 +111,15 @@ def upload_images_from_usb():
     minutes = int(elapsed_time // 60)
     seconds = int(elapsed_time % 60)
 
+    report_path = pipeline.finish(workers=MAX_WORKERS, succeeded=success_count, failed=error_count)
+
     print()
     print("=" * 70)
     print("Upload Complete!")
     print("=" * 70)
     print(f"✓ Successfully uploaded (this session): {success_count}")
     print(f"✗ Failed: {error_count}")
+    pipeline.print_summary(report_path)
     print(f"📊 Total uploaded: {len(uploaded_files) + success_count}/{len(image_files)}")
     print(f"⏱ Time taken: {minutes}m {seconds}s")
     if success_count > 0:
@@ -224,4 +134,23 @@ def upload_images_from_usb():
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Upload USB photos without face detection')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help='Parallel upload workers')
+    parser.add_argument('--stats-port', type=int, default=STATS_PORT,
+                        help='Serve live run stats as JSON on this port')
+    parser.add_argument('--profile', default=upload_pipeline.ENCODE_PROFILE, choices=list(PROFILES),
+                        help='Encoding profile: speed versus upload size')
+    parser.add_argument('--format', default=upload_pipeline.ENCODE_FORMAT, choices=list(FORMATS),
+                        help='Output image format')
+    parser.add_argument('--memory-mb', type=int, default=upload_pipeline.MEMORY_BUDGET_MB,
+                        help='Memory budget for decoded images')
+    parser.add_argument('--upload-mode', default=upload_pipeline.UPLOAD_MODE, choices=['auto', 'single', 'chunked'],
+                        help='Single request per photo, resumable chunks, or pick by size and link speed')
+    args = parser.parse_args()
+
+    MAX_WORKERS = args.workers
+    STATS_PORT = args.stats_port
+    pipeline = UploadPipeline('upload_usb_fast', profile=args.profile, fmt=args.format,
+                              memory_budget_mb=args.memory_mb, upload_mode=args.upload_mode)
     upload_images_from_usb()
@@ -0,0 +1,495 @@
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import upload_pipeline
+from app import photo_entry
+from listing import MAX_IDS_PER_CALL
+from encoding import PROFILES, FORMATS
+from manifest import MANIFEST_FILE, load_manifest, write_manifest
+from timeline import load_timeline
+from upload_pipeline import UploadPipeline, IMAGE_EXTENSIONS, UPLOAD_FOLDER
+
+# Live ingest during the event: watch the folder a tethered camera (or the
+# photographer's import) writes into, and send each photo through
+# the upload pipeline as soon as the file is complete.
+#   python watch_folder.py C:\Tether --workers 4
+
+WATCH_FOLDER = 'D:\\'
+MAX_WORKERS = 4
+SETTLE_SECONDS = 1.0  # A file must stop changing this long before it is read
+MAX_SETTLE_SECONDS = 30  # Upload anyway if a JPEG still has no end marker after this
+POLL_INTERVAL = 1.0  # Seconds between scans when inotify isn't available
+TICK = 0.25  # Seconds between debounce checks
+PUBLISH_INTERVAL = 1.0  # Uploaded photos are added to the manifest together within this window
+PUBLISH_BATCH = 20  # ... or as soon as this many are waiting
+GALLERY_URL = os.getenv('GALLERY_URL', 'http://127.0.0.1:5000')  # The app guests use; '' skips the visibility check
+VISIBLE_POLL_INTERVAL = 5.0  # Seconds between /api/photos/listed checks while photos wait to appear
+CLOSE_WAIT_SECONDS = 90  # On exit, wait this long for the last photos (app refresh interval plus slack)
+RUN_REPORT_DIR = 'run_reports'
+STATS_PORT = None  # e.g. 8765 to serve live stats
+
+# Compress, de-duplicate and upload, as upload_usb_fast.py does; made by main()
+pipeline = None
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+
+def is_image(path):
+    name = os.path.basename(path)
+    return not name.startswith('.') and Path(name).suffix in IMAGE_EXTENSIONS
+
+
+def scan_files(root):
+    """Every image file under root"""
+    for dirpath, _, files in os.walk(root):
+        for file in files:
+            path = os.path.join(dirpath, file)
+            if is_image(path):
+                yield path
+
+
+def looks_complete(path):
+    """False while a JPEG or PNG is missing its end marker (still being written)"""
+    suffix = Path(path).suffix.lower()
+    if suffix not in ('.jpg', '.jpeg', '.png'):
+        return True
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024))
+            tail = f.read()
+    except OSError:
+        return False
+    # Some cameras pad after the end marker, so look at the whole tail
+    return (b'IEND' if suffix == '.png' else b'\xff\xd9') in tail
+
+
+class InotifyWatcher:
+    """Changed files from Linux inotify, called through ctypes so nothing extra is installed"""
+
+    name = 'inotify'
+
+    def __init__(self, root):
+        self.root = root
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}  # watch descriptor -> directory
+        self.add_tree(root)
+
+    def add_tree(self, path):
+        for dirpath, _, _ in os.walk(path):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                # ENOSPC: raise fs.inotify.max_user_watches, or use --poll
+                raise OSError(ctypes.get_errno(), f'Cannot watch {dirpath}')
+            self.dirs[wd] = dirpath
+
+    def poll(self, timeout):
+        """Paths that changed, waiting up to timeout seconds for the first one"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                changed.extend(scan_files(self.root))  # Events were lost - look at everything
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files can land before the new folder's watch exists
+                    self.add_tree(path)
+                    changed.extend(scan_files(path))
+            elif is_image(path):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Changed files found by rescanning the tree (Windows, macOS, network shares)"""
+
+    name = 'polling'
+
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.known = {}  # path -> (size, mtime)
+        self.next_scan = 0
+
+    def poll(self, timeout):
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0, wait))
+        self.next_scan = time.monotonic() + self.interval
+
+        changed = []
+        current = {}
+        for path in scan_files(self.root):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            current[path] = (st.st_size, st.st_mtime_ns)
+            if self.known.get(path) != current[path]:
+                changed.append(path)
+        self.known = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(root, polling=False):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"⚠ inotify unavailable ({e}), polling every {POLL_INTERVAL}s instead")
+    return PollingWatcher(root)
+
+
+class Debouncer:
+    """Holds changed files until their size and mtime stop changing"""
+
+    def __init__(self, settle=SETTLE_SECONDS, max_settle=MAX_SETTLE_SECONDS):
+        self.settle = settle
+        self.max_settle = max_settle
+        self.pending = {}  # path -> [first seen, last change, (size, mtime)]
+
+    def touch(self, path, now):
+        entry = self.pending.get(path)
+        if entry is None:
+            self.pending[path] = [now, now, None]
+        else:
+            entry[1] = now
+
+    def ready(self, now):
+        """(path, first seen) for files that have been still for the settle time"""
+        settled = []
+        for path, entry in list(self.pending.items()):
+            first_seen, last_change, signature = entry
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]  # Deleted or renamed away; a rename shows up as a new path
+                continue
+
+            current = (st.st_size, st.st_mtime_ns)
+            if current != signature:
+                entry[1], entry[2] = now, current
+                continue
+            if now - last_change < self.settle:
+                continue
+            if not looks_complete(path) and now - first_seen < self.max_settle:
+                continue
+            del self.pending[path]
+            settled.append((path, first_seen))
+        return settled
+
+
+def add_to_manifest(public_ids, path=MANIFEST_FILE):
+    """Merge photos into the manifest in capture order; False if there is no manifest"""
+    manifest = load_manifest(path)
+    if manifest is None:
+        return False
+
+    photos = {photo['publicId']: photo for photo in manifest.photos}
+    timeline = load_timeline()
+    for public_id in public_ids:
+        photo = photo_entry(public_id)
+        position = timeline.positions.get(public_id) if timeline else None
+        if position is not None:
+            photo['takenAt'] = timeline.entries[position]['takenAt']
+        photos[public_id] = photo
+
+    ordered = list(photos.values())
+    if timeline is not None:
+        ordered.sort(key=lambda photo: timeline.sort_key(photo['publicId']))
+    # Keep the build time: uploads from other machines since then are still looked up live
+    write_manifest(ordered, path, manifest.built_at and datetime.fromisoformat(manifest.built_at))
+    return True
+
+
+class GalleryPublisher:
+    """Adds uploaded photos to the local manifest in batches and records when the served gallery lists each one.
+
+    The deployed app bakes its own manifest and picks up new uploads with a
+    periodic live query, so a photo only counts as visible once GALLERY_URL
+    lists it. /api/photos/listed answers that for the waiting ids without
+    the full /api/photos listing.
+    """
+
+    def __init__(self, manifest_path=MANIFEST_FILE, gallery_url=GALLERY_URL):
+        self.manifest_path = manifest_path
+        self.gallery_url = gallery_url.rstrip('/') if gallery_url else None
+        self.queue = queue.Queue()
+        self.waiting = {}  # public id -> (landed at, uploaded at)
+        self.published = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add(self, public_id, landed_at, uploaded_at):
+        self.queue.put((public_id, landed_at, uploaded_at))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        close_deadline = None  # Set once close() was called
+        next_check = 0
+        while close_deadline is None or self.waiting:
+            if close_deadline is not None:
+                # Give the app one refresh interval to list what was uploaded last
+                if time.monotonic() > close_deadline:
+                    break
+                time.sleep(max(0, next_check - time.monotonic()))
+            else:
+                batch = self._collect(timeout=VISIBLE_POLL_INTERVAL if self.waiting else None)
+                if batch and batch[-1] is None:
+                    close_deadline = time.monotonic() + CLOSE_WAIT_SECONDS
+                    batch.pop()
+                    if self.gallery_url and (self.waiting or batch):
+                        print(f"Waiting up to {CLOSE_WAIT_SECONDS}s for the gallery to list the last photos...")
+                if batch:
+                    self._publish(batch)
+
+            if self.waiting and time.monotonic() >= next_check:
+                next_check = time.monotonic() + VISIBLE_POLL_INTERVAL
+                self._check_gallery()
+
+        for public_id in self.waiting:
+            pipeline.stats.count('not_visible')
+            print(f"  ⚠ Not in the gallery yet: {public_id.rpartition('/')[2]}")
+
+    def _collect(self, timeout):
+        """Uploads that arrive within PUBLISH_INTERVAL of the first, ending with None on close"""
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + PUBLISH_INTERVAL
+        while batch[-1] is not None and len(batch) < PUBLISH_BATCH:
+            try:
+                batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _publish(self, batch):
+        try:
+            with pipeline.stats.stage('manifest'):
+                add_to_manifest([public_id for public_id, _, _ in batch], self.manifest_path)
+        except Exception as e:
+            pipeline.stats.count('publish_failed')
+            print(f"  ✗ Gallery index update failed: {str(e)}")
+
+        for public_id, landed_at, uploaded_at in batch:
+            if self.gallery_url:
+                self.waiting[public_id] = (landed_at, uploaded_at)
+            else:
+                self.published += 1
+
+    def _check_gallery(self):
+        waiting = list(self.waiting)
+        listed = set()
+        try:
+            with pipeline.stats.stage('visibility_check'):
+                for i in range(0, len(waiting), MAX_IDS_PER_CALL):
+                    query = urllib.parse.urlencode([('id', public_id) for public_id in waiting[i:i + MAX_IDS_PER_CALL]])
+                    with urllib.request.urlopen(f'{self.gallery_url}/api/photos/listed?{query}', timeout=30) as response:
+                        listed.update(json.load(response)['publicIds'])
+        except Exception as e:
+            pipeline.stats.count('visibility_check_failed')
+            print(f"  ⚠ Could not read {self.gallery_url}/api/photos/listed: {str(e)}")
+            return
+
+        visible_at = time.monotonic()
+        for public_id in [p for p in self.waiting if p in listed]:
+            landed_at, uploaded_at = self.waiting.pop(public_id)
+            pipeline.stats.record('publish', visible_at - uploaded_at)
+            pipeline.stats.record('end_to_end', visible_at - landed_at)
+            print(f"  👁 Visible: {public_id.rpartition('/')[2]} ({visible_at - landed_at:.1f}s after it landed)")
+            self.published += 1
+
+
+def ingest(image_file, index, landed_at, ready_at, uploaded, publisher):
+    """Upload one settled file and hand it to the publisher"""
+    pipeline.stats.record('queue_wait', time.monotonic() - ready_at)
+    result = pipeline.process_single_image(image_file, index, 'live')
+
+    if not result['success']:
+        uploaded.discard(image_file.name)  # A later write to the file retries it
+    elif not result.get('duplicate_of'):
+        public_id = f'{UPLOAD_FOLDER}/{image_file.stem}'
+        publisher.add(public_id, landed_at, time.monotonic())
+    return result
+
+
+def watch(root, workers=MAX_WORKERS, polling=False, manifest_path=MANIFEST_FILE, settle=SETTLE_SECONDS,
+          gallery_url=GALLERY_URL):
+    print("=" * 70)
+    print("Wedding Photo Live Ingest - watching for new photos")
+    print("=" * 70)
+    print()
+
+    if not os.path.isdir(root):
+        print(f"Error: folder {root} not found!")
+        return
+
+    # Fail before watching rather than on the first photo
+    pipeline.start(STATS_PORT)
+    stats = pipeline.stats
+    uploaded = pipeline.load_uploaded_files()
+
+    watcher = make_watcher(root, polling)
+    debouncer = Debouncer(settle)
+    publisher = GalleryPublisher(manifest_path, gallery_url)
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    print(f"Watching {root} ({watcher.name}), {workers} workers, "
+          f"encoding: {pipeline.profile} profile, {pipeline.format}")
+    if gallery_url:
+        print(f"Landed → visible is measured against {gallery_url.rstrip('/')}/api/photos")
+    else:
+        print("No gallery URL - landed → visible is not measured")
+    if load_manifest(manifest_path) is not None:
+        print(f"New photos are also added to {manifest_path} for an app running from this folder")
+    print("Press Ctrl+C to stop")
+    print()
+
+    # Photos that landed while the watcher wasn't running
+    now = time.monotonic()
+    for path in scan_files(root):
+        if os.path.basename(path) not in uploaded:
+            debouncer.touch(path, now)
+
+    count = 0
+    try:
+        while True:
+            for path in watcher.poll(TICK):
+                if os.path.basename(path) not in uploaded:
+                    debouncer.touch(path, time.monotonic())
+
+            now = time.monotonic()
+            for path, landed_at in debouncer.ready(now):
+                image_file = Path(path)
+                if image_file.name in uploaded:
+                    continue
+                uploaded.add(image_file.name)
+                stats.record('settle', now - landed_at)
+                stats.adjust_queue('pending', 1)
+                count += 1
+                executor.submit(ingest, image_file, count, landed_at, now, uploaded, publisher)
+    except KeyboardInterrupt:
+        print()
+        print("Stopping - finishing photos already in progress...")
+    finally:
+        watcher.close()
+        executor.shutdown(wait=True)
+        publisher.close()
+
+    snapshot = stats.snapshot()
+    report_path = stats.write_report(RUN_REPORT_DIR, extra={
+        'watchFolder': str(root),
+        'watcher': watcher.name,
+        'workers': workers,
+        'published': publisher.published,
+        'galleryUrl': gallery_url,
+        'memoryBudgetBytes': pipeline.memory_budget.limit,
+        'peakReservedBytes': pipeline.memory_budget.peak
+    })
+    stats.stop()
+
+    latency = snapshot['stages'].get('end_to_end')
+    print()
+    print("=" * 70)
+    print(f"✓ Published: {publisher.published}")
+    print(f"✗ Failed: {snapshot['counters'].get('failed', 0)}")
+    if snapshot['counters'].get('not_visible'):
+        print(f"⚠ Uploaded but not in the gallery yet: {snapshot['counters']['not_visible']}")
+    print(f"↷ Skipped duplicates: {snapshot['counters'].get('duplicates', 0)}")
+    if latency:
+        print(f"⏱ Landed → visible: p50 {latency['p50Seconds']:.1f}s, "
+              f"p95 {latency['p95Seconds']:.1f}s, max {latency['maxSeconds']:.1f}s")
+    print(f"📝 Run report: {report_path}")
+    print()
+
+
+def main(argv=None):
+    global pipeline, STATS_PORT
+
+    parser = argparse.ArgumentParser(description='Upload photos as they land in a folder')
+    parser.add_argument('folder', nargs='?', default=WATCH_FOLDER, help='Folder to watch (with subfolders)')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help='Parallel upload workers')
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help='Seconds a file must stop changing before it is uploaded')
+    parser.add_argument('--poll', action='store_true',
+                        help='Rescan the folder instead of using inotify')
+    parser.add_argument('--manifest', default=MANIFEST_FILE,
+                        help='Gallery manifest to update, if it exists')
+    parser.add_argument('--gallery-url', default=GALLERY_URL,
+                        help="The app guests use; photos count as visible once its /api/photos lists them ('' to skip)")
+    parser.add_argument('--stats-port', type=int, default=STATS_PORT,
+                        help='Serve live run stats as JSON on this port')
+    parser.add_argument('--profile', default=upload_pipeline.ENCODE_PROFILE, choices=list(PROFILES),
+                        help='Encoding profile: speed versus upload size')
+    parser.add_argument('--format', default=upload_pipeline.ENCODE_FORMAT, choices=list(FORMATS),
+                        help='Output image format')
+    parser.add_argument('--memory-mb', type=int, default=upload_pipeline.MEMORY_BUDGET_MB,
+                        help='Memory budget for decoded images')
+    parser.add_argument('--upload-mode', default=upload_pipeline.UPLOAD_MODE, choices=['auto', 'single', 'chunked'],
+                        help='Single request per photo, resumable chunks, or pick by size and link speed')
+    args = parser.parse_args(argv)
+
+    STATS_PORT = args.stats_port
+    pipeline = UploadPipeline('watch_folder', profile=args.profile, fmt=args.format,
+                              memory_budget_mb=args.memory_mb, upload_mode=args.upload_mode)
+    watch(args.folder, args.workers, args.poll, args.manifest, args.settle, args.gallery_url)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import zipfile
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+ZIP_FETCH_WORKERS = 4  # Photos downloaded from storage at once
+ZIP_CHUNK_SIZE = 64 * 1024  # Bytes handed to the response per yield
+FETCH_TIMEOUT = 60  # seconds
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that collects bytes for the response"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def fetch_from_cloudinary(public_id):
+    """Download the stored original of a photo (the SDK must already be configured)"""
+    import cloudinary
+    url = cloudinary.CloudinaryImage(public_id).build_url(secure=True)
+    with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT) as response:
+        return response.read()
+
+
+def make_local_fetcher(folder):
+    """Fetch photos from a local folder instead of Cloudinary (offline stand-in)"""
+    root = Path(folder)
+
+    def fetch(public_id):
+        name = Path(public_id).name
+        matches = sorted(root.glob(f'{name}.*'))
+        if not matches:
+            raise FileNotFoundError(f'{public_id} not found in {folder}')
+        return matches[0].read_bytes()
+
+    return fetch
+
+
+def image_extension(data):
+    """File extension from the image's magic bytes (uploads may be WebP or AVIF)"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return '.webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return '.avif'
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return '.png'
+    return '.jpg'
+
+
+def archive_name(public_id, data=b''):
+    """File name of a photo inside the archive"""
+    return f'{Path(public_id).name}{image_extension(data)}'
+
+
+def stream_zip(public_ids, fetch, max_workers=ZIP_FETCH_WORKERS):
+    """Yield a ZIP archive of the given photos while they are being fetched.
+
+    Photos are fetched concurrently and written in the order they arrive.
+    At most ``max_workers`` photos are held in memory at once. Entries are
+    stored uncompressed since compressed images don't shrink any further.
+    """
+    sink = _ChunkSink()
+    failed = []
+    used_names = set()
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        queue = iter(public_ids)
+
+        def submit_next():
+            for public_id in queue:
+                pending[executor.submit(fetch, public_id)] = public_id
+                return
+
+        for _ in range(max_workers):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                public_id = pending.pop(future)
+                submit_next()
+
+                try:
+                    data = future.result()
+                except Exception as e:
+                    failed.append(f'{public_id}: {str(e)}')
+                    continue
+
+                name = archive_name(public_id, data)
+                if name in used_names:
+                    name = f'{Path(public_id).name}-{len(used_names)}{image_extension(data)}'
+                used_names.add(name)
+
+                entry = zipfile.ZipInfo(name)
+                entry.compress_type = zipfile.ZIP_STORED
+                with archive.open(entry, 'w') as f:
+                    view = memoryview(data)
+                    for offset in range(0, len(view), ZIP_CHUNK_SIZE):
+                        f.write(view[offset:offset + ZIP_CHUNK_SIZE])
+                        chunk = sink.drain()
+                        if chunk:
+                            yield chunk
+                del view, data
+
+        if failed:
+            archive.writestr('MISSING.txt', '\n'.join(failed) + '\n')
+
+    yield sink.drain()